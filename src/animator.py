@@ -1,49 +1,49 @@
-import os
-from glob import glob
-
 import pygame
 
+import assets
 import constants as c
+from tracing import traced
+
+
+class AnimationClock:
+    """
+    Clock shared by all the animations of a game, advanced once per simulated frame
+    """
+
+    def __init__(self):
+        self.ticks = 0
+
+    def tick(self):
+        """
+        Advance the clock by a frame
+        """
+        self.ticks += 1
 
 
 class Animation:
     """
-    Class for animating objects
+    Class for animating objects.
+    The current frame is derived from the animation clock of the game,
+    counted from the tick the current state started at
     """
 
-    def __init__(self, image_paths, scale=3):
+    @traced('Animation.__init__')
+    def __init__(self, image_paths, clock, scale=3):
         """
         Initialize the object with the images
         :param image_paths: map with paths to images for each state
+        :param clock: AnimationClock of the game
         :param scale: scale of the images
         """
-        self.images = {}
-        for k, v in image_paths.items():
-            image_path = glob(os.path.join(v, '*.png'))
-            self.images[k] = []
-            for path in image_path:
-                img = pygame.image.load(path).convert_alpha()
-                scaled = pygame.transform.scale(img, (img.get_width() * scale, img.get_height() * scale))
-                self.images[k].append(scaled)
+        self.image_paths = image_paths
+        self.clock = clock
+        self.scale = scale
+        self.images = self.load_images(False)
 
         self.curr_state = next(iter(image_paths))
         self.flipped = False
-        self.frame_counter = 0
-        self.image_index = 0
-        self.image = self.images[self.curr_state][self.image_index]
-
-    def update(self):
-        """
-        Update the animation, change frame if needed
-        """
-
-        self.frame_counter += 1
-        if self.frame_counter >= c.ANIMATION_SPEED:
-            images = self.images[self.curr_state]
-
-            self.image_index = (self.image_index + 1) % len(images)
-            self.image = images[self.image_index]
-            self.frame_counter = 0
+        # Phase of the animation, states start playing from their first frame
+        self.start = self.clock.ticks
 
     def change_state(self, state):
         """
@@ -54,9 +54,8 @@ class Animation:
         if self.curr_state == state:
             return
 
-        self.image_index = 0
         self.curr_state = state
-        self.image = self.images[state][self.image_index]
+        self.start = self.clock.ticks
 
     def change_direction(self, flipped):
         """
@@ -68,15 +67,33 @@ class Animation:
             return
 
         self.flipped = flipped
-        for k, v in self.images.items():
-            for i in range(len(v)):
-                self.images[k][i] = pygame.transform.flip(v[i], True, False)
+        self.images = self.load_images(flipped)
+
+    def load_images(self, flipped):
+        """
+        Get the (shared) images for each state
+        :param flipped: should the images be flipped
+        :return: map with the list of images for each state
+        """
+        return {k: assets.load_frames(v, self.scale, flipped) for k, v in self.image_paths.items()}
+
+    def get_surfaces(self):
+        """
+        :return: all the loaded images of the animation, in both directions
+        """
+        surfaces = []
+        for flipped in (False, True):
+            for path in self.image_paths.values():
+                surfaces += assets.frames_cache.get((path, self.scale, flipped), [])
+        return surfaces
 
     def get_image(self):
         """
         :return: current animation image
         """
-        return self.image
+        images = self.images[self.curr_state]
+        elapsed = self.clock.ticks - self.start
+        return images[elapsed // c.ANIMATION_SPEED % len(images)]
 
     def get_full_time(self):
         """
@@ -89,10 +106,34 @@ class DamageOverlay:
     """
     Class for displaying red overlay when player is hit
     """
+    BORDER = 48
+
     def __init__(self, dim):
-        self.red_overlay = pygame.Surface(dim)
-        self.red_overlay.set_alpha(64)
-        self.red_overlay.fill((255, 0, 0))
+        self.dim = dim
+        # The surfaces are drawn at the internal resolution
+        render_scale = assets.get_render_scale()
+        size = (dim[0] // render_scale, dim[1] // render_scale)
+        border = self.BORDER // render_scale
+
+        # Tinting with a multiply and an add blend gives the same result as blending a red surface
+        # with alpha 64 (dst * 191/255 + red * 64/255), but the blend blits are cheaper than alpha blending
+        self.tint_mult = pygame.Surface(size).convert()
+        self.tint_mult.fill((191, 191, 191))
+        self.tint_add = pygame.Surface(size).convert()
+        self.tint_add.fill((64, 0, 0))
+
+        # Cheaper effect, tinting only the edges of the screen
+        self.border_h = pygame.Surface((size[0], border))
+        self.border_v = pygame.Surface((border, size[1] - 2 * border))
+        for border in (self.border_h, self.border_v):
+            border.set_alpha(96)
+            border.fill((255, 0, 0))
+
+    def get_surfaces(self):
+        """
+        :return: all the surfaces owned by the overlay
+        """
+        return [self.tint_mult, self.tint_add, self.border_h, self.border_v]
 
     def draw(self, screen):
         """
@@ -100,4 +141,15 @@ class DamageOverlay:
         :param screen: screen to draw on
         :return:
         """
-        screen.blit(self.red_overlay, (0, 0))
+        screen.blit(self.tint_mult, (0, 0), special_flags=pygame.BLEND_RGB_MULT)
+        screen.blit(self.tint_add, (0, 0), special_flags=pygame.BLEND_RGB_ADD)
+
+    def draw_border(self, screen):
+        """
+        Draws a red border around the screen, a cheaper alternative to the overlay
+        :param screen: screen to draw on
+        """
+        screen.blit(self.border_h, (0, 0))
+        screen.blit(self.border_h, (0, self.dim[1] - self.BORDER))
+        screen.blit(self.border_v, (0, self.BORDER))
+        screen.blit(self.border_v, (self.dim[0] - self.BORDER, self.BORDER))
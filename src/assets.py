@@ -0,0 +1,217 @@
+import os
+import time
+from glob import glob
+
+import pygame
+
+import constants as c
+
+# Resource paths are relative to the source directory, whatever the working directory is
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Formats the images are converted to, from the fastest to blit to the slowest
+OPAQUE = 'opaque'
+COLORKEY = 'colorkey'
+ALPHA = 'alpha'
+# Colorkey of the images with binary transparency, they keep per pixel alpha if a visible pixel has this color
+COLORKEY_COLOR = (255, 0, 255)
+
+# Loaded images are shared by all the objects using them and must not be modified
+image_cache = {}
+frames_cache = {}
+# Format each loaded image was converted to, by its cache key
+image_formats = {}
+# Size each loaded image covers in window coordinates, by the image
+window_sizes = {}
+
+
+def get_resource_path(path):
+    """
+    :param path: resource path, relative to the source directory
+    :return: path to the resource from the working directory
+    """
+    return os.path.join(SOURCE_DIR, path)
+
+
+def get_render_scale():
+    """
+    :return: factor the frame is drawn smaller by, 1 unless the surface backend draws at a lower resolution
+     (see RENDER_SCALE), it must not change once images are loaded
+    """
+    return c.RENDER_SCALE if c.RENDER_BACKEND == 'surface' else 1
+
+
+def get_window_size(image):
+    """
+    Collision rects and layouts use this size instead of the image size,
+    so that they do not depend on the render scale
+    :param image: image loaded with load_image, or a surface drawn at the internal resolution
+    :return: size the image covers in window coordinates
+    """
+    size = window_sizes.get(image)
+    if size is None:
+        render_scale = get_render_scale()
+        size = (image.get_width() * render_scale, image.get_height() * render_scale)
+    return size
+
+
+def load_alpha_image(path, scale=1, size=None, flipped=False):
+    """
+    Load an image with per pixel alpha. It is scaled once from the source pixels to its size
+    at the internal resolution of the render scale, exactly when the render scale divides the image scale
+    :param path: path to the image
+    :param scale: scale of the image in window coordinates
+    :param size: size of the image in window coordinates, overrides scale
+    :param flipped: should the image be flipped horizontally
+    :return: (image surface, size of the image in window coordinates)
+    """
+    image = pygame.image.load(get_resource_path(path)).convert_alpha()
+    if not size:
+        size = (image.get_width() * scale, image.get_height() * scale)
+    render_scale = get_render_scale()
+    # Rounded up, so that images tiled in window coordinates leave no gaps between them
+    scaled_size = (-(-size[0] // render_scale), -(-size[1] // render_scale))
+    if scaled_size != image.get_size():
+        image = pygame.transform.scale(image, scaled_size)
+    if flipped:
+        image = pygame.transform.flip(image, True, False)
+    return image, size
+
+
+def get_alpha_kind(image):
+    """
+    :param image: surface with per pixel alpha
+    :return: OPAQUE if all the pixels are opaque, COLORKEY if they are either opaque or fully transparent,
+     ALPHA otherwise
+    """
+    alpha = pygame.image.tobytes(image, 'RGBA')[3::4]
+    if not alpha.translate(None, b'\xff'):
+        return OPAQUE
+    if not alpha.translate(None, b'\x00\xff'):
+        return COLORKEY
+    return ALPHA
+
+
+def is_same_output(image, converted):
+    """
+    Check that a converted image is drawn the same as the original one, on a dark and a light background
+    :param image: original image
+    :param converted: converted image
+    :return: are the drawn pixels identical
+    """
+    for color in ((0, 0, 0), (255, 255, 255)):
+        drawn = []
+        for surface in (image, converted):
+            background = pygame.Surface(image.get_size()).convert()
+            background.fill(color)
+            background.blit(surface, (0, 0))
+            drawn.append(pygame.image.tobytes(background, 'RGB'))
+        if drawn[0] != drawn[1]:
+            return False
+    return True
+
+
+def optimize_format(image):
+    """
+    Convert an image to the fastest format to blit that draws it the same - without alpha if it is opaque,
+    with an RLE accelerated colorkey if its transparency is binary
+    :param image: surface with per pixel alpha
+    :return: (converted image, format)
+    """
+    kind = get_alpha_kind(image)
+    if kind == OPAQUE:
+        converted = image.convert()
+    elif kind == COLORKEY:
+        converted = pygame.Surface(image.get_size()).convert()
+        converted.fill(COLORKEY_COLOR)
+        converted.blit(image, (0, 0))
+        converted.set_colorkey(COLORKEY_COLOR, pygame.RLEACCEL)
+    else:
+        return image, ALPHA
+
+    if not is_same_output(image, converted):
+        return image, ALPHA
+    return converted, kind
+
+
+def load_image(path, scale=1, size=None, flipped=False):
+    """
+    Load an image, or get it from the cache if it was already loaded
+    :param path: path to the image
+    :param scale: scale of the image in window coordinates
+    :param size: size of the image in window coordinates, overrides scale
+    :param flipped: should the image be flipped horizontally
+    :return: image surface, at the internal resolution of the render scale (see get_window_size)
+    """
+    key = (path, scale, size, flipped)
+    image = image_cache.get(key)
+    if image is not None:
+        return image
+
+    image, window_size = load_alpha_image(path, scale, size, flipped)
+    image_format = ALPHA
+    if c.OPTIMIZE_IMAGE_FORMATS:
+        image, image_format = optimize_format(image)
+
+    image_cache[key] = image
+    image_formats[key] = image_format
+    window_sizes[image] = window_size
+    return image
+
+
+def load_frames(directory, scale=1, flipped=False):
+    """
+    Load all the frames of an animation
+    :param directory: directory with the frames
+    :param scale: scale of the frames
+    :param flipped: should the frames be flipped horizontally
+    :return: list of frame surfaces, ordered by file name
+    """
+    key = (directory, scale, flipped)
+    frames = frames_cache.get(key)
+    if frames is None:
+        names = sorted(glob('*.png', root_dir=get_resource_path(directory)))
+        paths = [os.path.join(directory, name) for name in names]
+        frames = [load_image(path, scale, flipped=flipped) for path in paths]
+        frames_cache[key] = frames
+    return frames
+
+
+def measure_blit(image, target, repeats):
+    """
+    :param image: image to draw
+    :param target: surface to draw on
+    :param repeats: number of blits measured
+    :return: time per blit in microseconds
+    """
+    start = time.perf_counter()
+    for _ in range(repeats):
+        target.blit(image, (0, 0))
+    return (time.perf_counter() - start) / repeats * 1e6
+
+
+def format_report(repeats=200):
+    """
+    Measure the blit time of every loaded image against its per pixel alpha version
+    :param repeats: number of blits measured per image
+    :return: report text
+    """
+    target = pygame.Surface(pygame.display.get_surface().get_size()).convert()
+    lines = [f"{'format':<8} {'alpha us':>8} {'now us':>8} {'speedup':>7}  image"]
+    totals = {}
+    for key, image_format in sorted(image_formats.items(), key=lambda item: (item[1], item[0][0])):
+        alpha_us = measure_blit(load_alpha_image(*key)[0], target, repeats)
+        image_us = measure_blit(image_cache[key], target, repeats)
+        total = totals.setdefault(image_format, [0, 0, 0])
+        total[0] += 1
+        total[1] += alpha_us
+        total[2] += image_us
+
+        path, scale, size, flipped = key
+        name = f"{path} x{scale}" if not size else f"{path} {size[0]}x{size[1]}"
+        lines.append(f"{image_format:<8} {alpha_us:>8.2f} {image_us:>8.2f} {alpha_us / image_us:>6.2f}x  "
+                     f"{name}{' flipped' if flipped else ''}")
+
+    for image_format, (count, alpha_us, image_us) in totals.items():
+        lines.append(f"{image_format}: {count} images, blits {alpha_us / image_us:.2f}x as fast as with alpha")
+    return '\n'.join(lines)
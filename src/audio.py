@@ -0,0 +1,111 @@
+import os
+
+import pygame
+
+from assets import get_resource_path
+
+# Decoded sound effects are cached on disk in the mixer's format, so they are decoded once across launches
+PCM_CACHE_DIR = 'resources/sounds/cache'
+# Channels reserved for the sound effects, each sound effect plays on a fixed one of them
+CHANNEL_BUDGET = 4
+
+# Loaded sounds are shared by all the objects using them and must not be modified
+sound_cache = {}
+sound_channels = {}
+
+
+def init_mixer():
+    """
+    Initialize the mixer and reserve the channels of the sound effects,
+    so that they are never taken by other sounds
+    """
+    pygame.mixer.init()
+    pygame.mixer.set_reserved(CHANNEL_BUDGET)
+
+
+def get_pcm_path(path):
+    """
+    :param path: path to the sound file
+    :return: path to the decoded samples of the sound in the current mixer format
+    """
+    frequency, size, channels = pygame.mixer.get_init()
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(get_resource_path(PCM_CACHE_DIR), f'{name}-{frequency}-{size}-{channels}.pcm')
+
+
+def decode_sound(path):
+    """
+    Decode a sound file to samples in the mixer format, reading them from the cache
+    if it is newer than the sound file
+    :param path: path to the sound file
+    :return: raw samples
+    """
+    pcm_path = get_pcm_path(path)
+    path = get_resource_path(path)
+    if os.path.exists(pcm_path) and os.path.getmtime(pcm_path) >= os.path.getmtime(path):
+        with open(pcm_path, 'rb') as f:
+            return f.read()
+
+    samples = pygame.mixer.Sound(path).get_raw()
+    os.makedirs(os.path.dirname(pcm_path), exist_ok=True)
+    # Written under a temporary name first, so that concurrent launches never read a partial file
+    temp_path = f'{pcm_path}.{os.getpid()}'
+    with open(temp_path, 'wb') as f:
+        f.write(samples)
+    os.replace(temp_path, pcm_path)
+    return samples
+
+
+def load_sound(path, volume=None):
+    """
+    Load a sound effect, or get it from the cache if it was already loaded
+    :param path: path to the sound file
+    :param volume: optional volume of the sound
+    :return: sound object, None if the mixer is not initialized (headless mode)
+    """
+    if not pygame.mixer.get_init():
+        return None
+
+    key = (path, volume)
+    sound = sound_cache.get(key)
+    if sound is not None:
+        return sound
+
+    sound = pygame.mixer.Sound(buffer=decode_sound(path))
+    if volume is not None:
+        sound.set_volume(volume)
+    sound_cache[key] = sound
+    sound_channels[sound] = pygame.mixer.Channel(len(sound_channels) % CHANNEL_BUDGET)
+    return sound
+
+
+def play_sound(sound):
+    """
+    Play a sound effect loaded with load_sound on its reserved channel,
+    restarting it if it is still playing
+    :param sound: sound object
+    """
+    if sound is not None:
+        sound_channels[sound].play(sound)
+
+
+def play_music(path, volume=0.5):
+    """
+    Play background music in a loop
+    :param path: path to the music file
+    :param volume: music volume
+    """
+    if not pygame.mixer.get_init():
+        return
+
+    pygame.mixer.music.load(get_resource_path(path))
+    pygame.mixer.music.set_volume(volume)
+    pygame.mixer.music.play(loops=1000)
+
+
+def stop_music():
+    """
+    Stop the background music
+    """
+    if pygame.mixer.get_init():
+        pygame.mixer.music.stop()
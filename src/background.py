@@ -1,5 +1,6 @@
 import pygame
 
+import assets
 import constants as c
 from animator import Animation
 
@@ -17,74 +18,93 @@ class ScrollingBackground:
     along with the health bar
     """
 
-    def __init__(self, dims):
+    def __init__(self, dims, clock):
+        """
+        Initialize the background
+        :param dims: window dimensions
+        :param clock: AnimationClock of the game, animating the water
+        """
         self.window = dims
 
-        bg_img = pygame.image.load(BG_PATH).convert()
-        bg_scaled = pygame.transform.scale(bg_img, dims)
-        self.bg_img = bg_scaled
+        self.bg_img = assets.load_image(BG_PATH, size=dims)
+        self.cloud_img = assets.load_image(CLOUD_PATH, 3)
 
-        cloud_img = pygame.image.load(CLOUD_PATH).convert_alpha()
-        cloud_scaled = pygame.transform.scale(cloud_img, (cloud_img.get_width() * 3, cloud_img.get_height() * 3))
-        self.cloud_img = cloud_scaled
+        self.water_anim = Animation({'water': WATER_PATH}, clock, scale=4)
+        self.water_reflex = Animation({'water': WATER_REFLEX_PATH}, clock, scale=2)
+        self.water_reflect = Animation({'water': WATER_REFLECT_PATH}, clock, scale=4)
 
-        self.water_anim = Animation({'water': WATER_PATH}, scale=4)
-        self.water_reflex = Animation({'water': WATER_REFLEX_PATH}, scale=2)
-        self.water_reflect = Animation({'water': WATER_REFLECT_PATH}, scale=4)
+        # Number of water animations drawn and should the clouds move, set by the quality level
+        self.water_layers = 3
+        self.scroll_clouds = True
 
         self.speed = c.BG_ANIMATION_SPEED
+        self.cloud_width = assets.get_window_size(self.cloud_img)[0]
         self.x1 = 0
-        self.x2 = -self.cloud_img.get_width()
+        self.x2 = -self.cloud_width
 
-        health_img = pygame.image.load(HEALTH_BAR_PATH).convert_alpha()
-        health_size = (health_img.get_width() * 4, health_img.get_height() * 4)
-        health_img_scaled = pygame.transform.scale(health_img, health_size)
-        self.health_bar = health_img_scaled
+        self.health_bar = assets.load_image(HEALTH_BAR_PATH, 4)
 
-        self.font = pygame.font.Font(None, 60)
+        self.font = pygame.font.Font(None, 60 // assets.get_render_scale())
+
+    def get_surfaces(self):
+        """
+        :return: all the surfaces owned by the background
+        """
+        surfaces = [self.bg_img, self.cloud_img, self.health_bar]
+        for animation in (self.water_anim, self.water_reflex, self.water_reflect):
+            surfaces += animation.get_surfaces()
+        return surfaces
 
     def update(self):
         """
-        Update background images positions and animations
+        Update background images positions, the water animations follow the animation clock
         """
-        self.x1 += self.speed
-        self.x2 += self.speed
-        if self.x1 >= self.cloud_img.get_width():
-            self.x1 = self.x2 - self.cloud_img.get_width()
-        if self.x2 >= self.cloud_img.get_width():
-            self.x2 = self.x1 - self.cloud_img.get_width()
-
-        self.water_anim.update()
-        self.water_reflex.update()
-        self.water_reflect.update()
-
-    def draw(self, screen, health, score):
+        if self.scroll_clouds:
+            self.x1 += self.speed
+            self.x2 += self.speed
+            if self.x1 >= self.cloud_width:
+                self.x1 = self.x2 - self.cloud_width
+            if self.x2 >= self.cloud_width:
+                self.x2 = self.x1 - self.cloud_width
+
+    def draw(self, blits):
         """
-        Draw background images
-        :param screen: screen instance
-        :param health: player health
+        Collect the blits of the background images
+        :param blits: list of (surface, position) pairs to add the blits to
         """
-
-        screen.blit(self.bg_img, (0, 0))
-
-        screen.blit(self.cloud_img, (self.x1, 180))
-        screen.blit(self.cloud_img, (self.x2, 180))
-        screen.blit(self.water_reflect.get_image(), (0, 500))
-        screen.blit(self.water_reflect.get_image(), (self.window[0] // 2, 500))
+        blits.append((self.bg_img, (0, 0)))
+
+        blits.append((self.cloud_img, (self.x1, 180)))
+        blits.append((self.cloud_img, (self.x2, 180)))
+        if self.water_layers >= 3:
+            water_reflect = self.water_reflect.get_image()
+            blits.append((water_reflect, (0, 500)))
+            blits.append((water_reflect, (self.window[0] // 2, 500)))
+        water_anim = self.water_anim.get_image()
+        water_reflex = self.water_reflex.get_image()
         for i in range(0, self.window[0], 384):
-            screen.blit(self.water_anim.get_image(), (i, self.window[1] - 64))
-            screen.blit(self.water_reflex.get_image(), (i, self.window[1] - 60))
-            screen.blit(self.water_reflex.get_image(), (i + 128, self.window[1] - 60))
+            blits.append((water_anim, (i, self.window[1] - 64)))
+            if self.water_layers >= 2:
+                blits.append((water_reflex, (i, self.window[1] - 60)))
+                blits.append((water_reflex, (i + 128, self.window[1] - 60)))
 
+    def draw_hud(self, screen, health, score):
+        """
+        Draw the health bar and the score
+        :param screen: screen instance
+        :param health: player health
+        :param score: score
+        """
         self.draw_health_bar(screen, health)
         self.draw_score(screen, score)
 
     def draw_health_bar(self, screen, health):
         screen.blit(self.health_bar, (20, 20))
         bar_prog = health * 304 / 100
-        pygame.draw.rect(screen, pygame.color.Color('Red'), (88, 48, bar_prog, 8))
+        screen.fill(pygame.color.Color('Red'), (88, 48, bar_prog, 8))
 
     def draw_score(self, screen, score):
         score_text = self.font.render(f"Score: {score}", True, (255, 255, 255))
-        pos = (self.window[0] - score_text.get_width() - 30, score_text.get_height())
+        width, height = assets.get_window_size(score_text)
+        pos = (self.window[0] - width - 30, height)
         screen.blit(score_text, pos)
@@ -0,0 +1,226 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import statistics
+import time
+from collections import Counter
+
+import controls
+import env
+from stats import percentile
+
+env_instance = None
+
+
+def bot_policy(obs):
+    """
+    Fixed bot policy - run right and jump in front of walls and gaps
+    :param obs: environment observation
+    :return: action
+    """
+    col = min(int(obs[0] * env.VIEW_COLUMNS), env.VIEW_COLUMNS - 3)
+    height = obs[5 + col]
+    for ahead in obs[6 + col:8 + col]:
+        if ahead > height or ahead == 0:
+            return controls.RIGHT | controls.JUMP
+    return controls.RIGHT
+
+
+def chunk_type_name(chunk_type):
+    """
+    :param chunk_type: chunk generating function
+    :return: short name of the chunk type, e.g. 'shell' for gen_shell_chunk
+    """
+    return chunk_type.__name__.replace('gen_', '').replace('_chunk', '')
+
+
+def init_worker():
+    """
+    Create the environment reused by all sessions of a worker process
+    """
+    global env_instance
+    env_instance = env.PirateEnv()
+
+
+def run_session(args):
+    """
+    Run a single headless session with the bot policy
+    :param args: (seed, maximum number of frames)
+    :return: dictionary with the session results
+    """
+    seed, max_frames = args
+    e = env_instance
+    obs = e.reset(seed)
+    game = e.game
+
+    chunk_types = Counter()
+    transitions = Counter()
+    last_chunk = game.chunks[-1]
+    # The session starts on the fixed initial chunk, not on a generated one
+    prev_type = 'initial'
+    entity_frames = 0
+    max_entities = 0
+
+    frames = 0
+    start = time.perf_counter()
+    done = False
+    while not done and frames < max_frames:
+        obs, _, done, _ = e.step(bot_policy(obs))
+        frames += 1
+
+        if game.chunks[-1] is not last_chunk:
+            last_chunk = game.chunks[-1]
+            curr_type = chunk_type_name(game.chunk_generator.prev_chunk)
+            chunk_types[curr_type] += 1
+            transitions[f"{prev_type}->{curr_type}"] += 1
+            prev_type = curr_type
+
+        entities = sum(len(chunk.entities) for chunk in game.chunks)
+        entity_frames += entities
+        max_entities = max(max_entities, entities)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'seed': seed,
+        'score': game.get_score(),
+        'frames': frames,
+        'lost': done,
+        'mean_entities': entity_frames / frames if frames else 0,
+        'max_entities': max_entities,
+        'frame_ms': elapsed * 1000 / frames if frames else 0,
+        'seconds': elapsed,
+        'pid': os.getpid(),
+        'chunk_types': dict(chunk_types),
+        'transitions': dict(transitions),
+        'generator': dict(game.chunk_generator.stats),
+    }
+
+
+def summarize(results, elapsed, workers):
+    """
+    Aggregate the session results into a report
+    :param results: list of session results
+    :param elapsed: wall time of the whole batch
+    :param workers: number of worker processes
+    :return: report dictionary
+    """
+    scores = sorted(r['score'] for r in results)
+    frame_ms = sorted(r['frame_ms'] for r in results)
+    frames = sum(r['frames'] for r in results)
+    busy = sum(r['seconds'] for r in results)
+
+    chunk_types = Counter()
+    transitions = Counter()
+    generator_stats = Counter()
+    for r in results:
+        chunk_types.update(r['chunk_types'])
+        transitions.update(r['transitions'])
+        generator_stats.update(r['generator'])
+    attempts = generator_stats['generated'] + generator_stats['rejected']
+
+    return {
+        'sessions': len(results),
+        'workers': workers,
+        'score': {
+            'mean': statistics.mean(scores),
+            'median': statistics.median(scores),
+            'p10': percentile(scores, 10),
+            'p90': percentile(scores, 90),
+            'max': scores[-1],
+        },
+        'lost_ratio': sum(r['lost'] for r in results) / len(results),
+        'entities': {
+            'mean': statistics.mean(r['mean_entities'] for r in results),
+            'max': max(r['max_entities'] for r in results),
+        },
+        'frame_ms': {
+            'mean': busy * 1000 / frames,
+            'median_session': statistics.median(frame_ms),
+            'p99_session': percentile(frame_ms, 99),
+        },
+        'chunk_types': dict(chunk_types.most_common()),
+        'transitions': dict(transitions.most_common()),
+        'generator': {
+            'rejection_rate': generator_stats['rejected'] / attempts if attempts else 0,
+            **dict(generator_stats.most_common()),
+        },
+        'throughput': {
+            'seconds': elapsed,
+            'sessions_per_sec': len(results) / elapsed,
+            'frames_per_sec': frames / elapsed,
+            'frames_per_sec_per_core': frames / busy,
+        },
+    }
+
+
+CSV_FIELDS = ['seed', 'score', 'frames', 'lost', 'mean_entities', 'max_entities', 'frame_ms', 'seconds', 'pid']
+
+
+def run_batch(seeds, max_frames, workers, csv_path=None):
+    """
+    Run the sessions across a process pool
+    :param seeds: seeds of the sessions
+    :param max_frames: maximum number of frames per session
+    :param workers: number of worker processes
+    :param csv_path: optional path of a CSV file the per-session results are streamed to
+    :return: aggregated report
+    """
+    csv_file = open(csv_path, 'w', newline='') if csv_path else None
+    writer = None
+    if csv_file:
+        writer = csv.DictWriter(csv_file, CSV_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+
+    results = []
+    start = time.perf_counter()
+    ctx = multiprocessing.get_context('spawn')
+    try:
+        with ctx.Pool(workers, initializer=init_worker) as pool:
+            tasks = [(seed, max_frames) for seed in seeds]
+            for result in pool.imap_unordered(run_session, tasks, chunksize=4):
+                results.append(result)
+                if writer:
+                    writer.writerow(result)
+            # Let the workers exit on their own, terminating them can deadlock the pool
+            pool.close()
+            pool.join()
+    finally:
+        if csv_file:
+            csv_file.close()
+
+    return summarize(results, time.perf_counter() - start, workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run seeded headless sessions with a bot policy")
+    parser.add_argument('--sessions', type=int, default=100, help="number of sessions")
+    parser.add_argument('--first-seed', type=int, default=0, help="seed of the first session")
+    parser.add_argument('--max-frames', type=int, default=3600, help="maximum number of frames per session")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument('--json', metavar='PATH', help="write the aggregated report to a JSON file")
+    parser.add_argument('--csv', metavar='PATH', help="stream the per-session results to a CSV file")
+    args = parser.parse_args()
+    if args.max_frames < 1:
+        parser.error("--max-frames must be at least 1")
+    if args.sessions < 1:
+        parser.error("--sessions must be at least 1")
+
+    seeds = range(args.first_seed, args.first_seed + args.sessions)
+    report = run_batch(seeds, args.max_frames, args.workers, args.csv)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    throughput = report['throughput']
+    print(f"{report['sessions']} sessions in {throughput['seconds']:.1f}s - "
+          f"{throughput['sessions_per_sec']:.1f} sessions/s, {throughput['frames_per_sec']:.0f} frames/s, "
+          f"{throughput['frames_per_sec_per_core']:.0f} frames/s per core")
+
+
+if __name__ == '__main__':
+    main()
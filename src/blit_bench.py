@@ -0,0 +1,100 @@
+import argparse
+import os
+import time
+
+import pygame
+
+import assets
+import constants as c
+import env
+import terrain
+
+# Ways of drawing the sprites compared by the benchmark
+METHODS = ('group_draw', 'blit_loop', 'blits')
+
+
+def make_sprites(count, size):
+    """
+    Create terrain sprites laid out in a grid over the window
+    :param count: number of sprites
+    :param size: size of the sprite images, the terrain block size if None
+    :return: sprite group
+    """
+    group = pygame.sprite.Group()
+    columns = c.WINDOW[0] // c.BLOCK_SIZE
+    for i in range(count):
+        position = (i % columns * c.BLOCK_SIZE, i // columns % c.CHUNK_HEIGHT * c.BLOCK_SIZE)
+        sprite = terrain.Terrain(terrain.GRASS_IMG_PATH, position)
+        if size:
+            sprite.image = pygame.transform.scale(sprite.image, size)
+        group.add(sprite)
+    return group
+
+
+def time_method(method, screen, group, repeats):
+    """
+    Measure drawing all the sprites of a group
+    :param method: one of METHODS
+    :param screen: surface to draw on
+    :param group: sprite group
+    :param repeats: number of times the sprites are drawn
+    :return: time per sprite in microseconds
+    """
+    start = time.perf_counter()
+    for _ in range(repeats):
+        if method == 'group_draw':
+            group.draw(screen)
+        elif method == 'blit_loop':
+            for sprite in group:
+                screen.blit(sprite.image, (sprite.rect.x, sprite.rect.y))
+        else:
+            screen.blits([(sprite.image, (sprite.rect.x, sprite.rect.y)) for sprite in group], doreturn=False)
+    return (time.perf_counter() - start) / (repeats * len(group)) * 1e6
+
+
+def run_bench(counts, repeats, size=None):
+    """
+    Compare the drawing methods for each sprite count
+    :param counts: sprite counts
+    :param repeats: number of times the sprites are drawn for each measurement
+    :param size: size of the sprite images, the terrain block size if None
+    :return: list of {'sprites': count, method: microseconds per sprite} rows
+    """
+    screen = pygame.display.set_mode(c.WINDOW)
+    rows = []
+    for count in counts:
+        group = make_sprites(count, size)
+        row = {'sprites': count}
+        for method in METHODS:
+            row[method] = time_method(method, screen, group, repeats)
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the per sprite cost of the ways of drawing sprites")
+    parser.add_argument('--counts', type=int, nargs='+', default=[50, 200, 1000], help="sprite counts")
+    parser.add_argument('--repeats', type=int, default=200, help="times the sprites are drawn per measurement")
+    parser.add_argument('--assets', action='store_true',
+                        help="report the format each game image is converted to and its blit speedup instead")
+    args = parser.parse_args()
+
+    if args.assets:
+        # The environment loads all the images of a session
+        env.PirateEnv()
+        print(assets.format_report(args.repeats))
+        return
+
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.display.init()
+
+    # Tiny images leave only the call overhead, the block size images show its share of a real blit
+    for label, size in (('1x1 images', (1, 1)), (f'{c.BLOCK_SIZE}x{c.BLOCK_SIZE} images', None)):
+        print(f"{label}, us per sprite:")
+        print(f"{'sprites':>7} " + ' '.join(f'{method:>10}' for method in METHODS))
+        for row in run_bench(args.counts, args.repeats, size):
+            print(f"{row['sprites']:>7} " + ' '.join(f'{row[method]:>10.3f}' for method in METHODS))
+
+
+if __name__ == '__main__':
+    main()
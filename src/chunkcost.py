@@ -0,0 +1,76 @@
+import random
+
+
+class ChunkCostModel:
+    """
+    Estimated per frame cost of each chunk type, in milliseconds.
+    The static estimate comes from the average terrain sprite and entity counts of the chunk type's layouts.
+    The measured update and draw times of the chunks are kept as exponential moving averages,
+    which replace the static estimate when the model is adaptive. Measured times differ between runs,
+    so an adaptive model makes the generated chunks depend on the machine and a replay would not match its recording
+    """
+    # Estimated cost of a terrain sprite and an entity, in milliseconds per frame
+    SPRITE_MS = 0.002
+    ENTITY_MS = 0.03
+    # Weight of the latest measurement in the moving averages
+    SMOOTHING = 0.02
+    # Layouts generated per chunk type for the static estimate
+    SAMPLES = 20
+
+    def __init__(self, adaptive=False):
+        """
+        Initialize the cost model
+        :param adaptive: should the measured times be used for the estimates
+        """
+        self.adaptive = adaptive
+        self.static = {}
+        self.measured = {'update': {}, 'draw': {}}
+
+    def sample_layouts(self, chunk_types, gen_layout):
+        """
+        Estimate the cost of the chunk types from the sprite and entity counts of sample layouts.
+        The layouts are sampled with a fixed seed and the RNG state is restored afterwards,
+        so that the estimates are the same in every session and the sampling does not change the generated chunks
+        :param chunk_types: chunk types to estimate
+        :param gen_layout: function generating a (grid, entity spawns) layout of a chunk type
+        """
+        state = random.getstate()
+        random.seed(0)
+        for chunk_type in chunk_types:
+            sprites = entities = 0
+            for _ in range(self.SAMPLES):
+                grid, spawns = gen_layout(chunk_type)
+                sprites += sum(1 for row in grid for cell in row if cell)
+                entities += len(spawns)
+            self.static[chunk_type] = (sprites * self.SPRITE_MS + entities * self.ENTITY_MS) / self.SAMPLES
+        random.setstate(state)
+
+    def record(self, kind, chunk_type, ms):
+        """
+        Record the measured cost of a chunk in a frame
+        :param kind: 'update' or 'draw'
+        :param chunk_type: type of the chunk
+        :param ms: time spent on the chunk, in milliseconds
+        """
+        averages = self.measured[kind]
+        average = averages.get(chunk_type)
+        averages[chunk_type] = ms if average is None else average + (ms - average) * self.SMOOTHING
+
+    def estimate(self, chunk_type):
+        """
+        :param chunk_type: type of the chunk
+        :return: estimated cost of the chunk type per frame, in milliseconds
+        """
+        if not self.adaptive or chunk_type not in self.measured['update']:
+            return self.static.get(chunk_type, 0)
+        return self.measured['update'][chunk_type] + self.measured['draw'].get(chunk_type, 0)
+
+    def report(self):
+        """
+        :return: map of chunk type names to their static and measured costs, in milliseconds per frame
+        """
+        return {chunk_type.__name__: {
+            'static_ms': static,
+            'update_ms': self.measured['update'].get(chunk_type),
+            'draw_ms': self.measured['draw'].get(chunk_type),
+        } for chunk_type, static in self.static.items()}
@@ -1,4 +1,25 @@
 DEBUG = False
+# Print a memory report every this many frames, 0 to only print it on demand (F9)
+MEMORY_REPORT_INTERVAL = 0
+# Skip gravity and terrain collisions for entities resting on a terrain block until they move again
+SLEEP_ENTITIES = True
+# Lower the quality level when frames take too long
+ADAPTIVE_QUALITY = True
+# Run the garbage collector in the idle time at the end of the frames instead of automatically
+GC_POLICY = True
+# How the frames are drawn - 'surface' (software blits onto the window surface),
+# 'texture' (SDL renderer, on the GPU when available) or 'software' (SDL renderer without the GPU)
+RENDER_BACKEND = 'surface'
+# Draw the frame at a resolution this many times smaller and upscale it to the window, 1 to draw at full resolution
+RENDER_SCALE = 1
+# Convert the images to the fastest format to blit that draws them the same (see assets.optimize_format)
+OPTIMIZE_IMAGE_FORMATS = True
+# Estimated cost of the chunks on the screen the generator keeps under, in milliseconds per frame, 0 for no limit.
+# The budget changes the chunks generated for a seed, a replay must use the budget of its recording
+CHUNK_COST_BUDGET = 0
+# With a budget, estimate the chunk costs from their measured update and draw times when playing live
+# without recording, from their sprite and entity counts otherwise
+ADAPTIVE_CHUNK_COSTS = True
 
 WINDOW = (1280, 720)
 ANIMATION_SPEED = 7
@@ -0,0 +1,141 @@
+import struct
+
+import pygame
+
+LEFT = 1
+RIGHT = 2
+JUMP = 4
+RESTART = 8
+
+
+def read_keyboard():
+    """
+    Read the current keyboard state
+    :return: bitmask of the pressed controls
+    """
+    keys = pygame.key.get_pressed()
+    controls = 0
+    if keys[pygame.K_a] or keys[pygame.K_LEFT]:
+        controls |= LEFT
+    if keys[pygame.K_d] or keys[pygame.K_RIGHT]:
+        controls |= RIGHT
+    if keys[pygame.K_SPACE]:
+        controls |= JUMP
+    return controls
+
+
+class KeyboardInput:
+    """
+    Input source reading the keyboard
+    """
+    live = True
+
+    def poll(self):
+        """
+        :return: controls for the current frame
+        """
+        return read_keyboard()
+
+
+class InputRecorder:
+    """
+    Class for recording the per-frame controls into a binary log.
+    The log starts with a header holding the RNG seed,
+    followed by run-length encoded (controls, frame count) pairs
+    """
+    MAGIC = b'PGIR'
+    VERSION = 1
+    HEADER = struct.Struct('<4sBq')
+    RUN = struct.Struct('<BH')
+    MAX_RUN = 0xFFFF
+
+    def __init__(self, path, seed):
+        """
+        Open the log and write the header
+        :param path: log file path
+        :param seed: RNG seed of the recorded session
+        """
+        self.file = open(path, 'wb')
+        self.file.write(self.HEADER.pack(self.MAGIC, self.VERSION, seed))
+        self.controls = None
+        self.run = 0
+        self.frames = 0
+
+    def record(self, controls):
+        """
+        Record the controls of a single frame
+        :param controls: controls bitmask
+        """
+        self.frames += 1
+        if controls == self.controls and self.run < self.MAX_RUN:
+            self.run += 1
+            return
+
+        self.flush_run()
+        self.controls = controls
+        self.run = 1
+
+    def flush_run(self):
+        """
+        Write the pending run to the log
+        """
+        if self.run:
+            self.file.write(self.RUN.pack(self.controls, self.run))
+
+    def close(self):
+        """
+        Write the pending run and close the log
+        """
+        if self.file.closed:
+            return
+        self.flush_run()
+        self.run = 0
+        self.file.close()
+
+
+class InputReplay:
+    """
+    Input source replaying a log written by InputRecorder
+    """
+    live = False
+
+    def __init__(self, path):
+        """
+        Load the log
+        :param path: log file path
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        header = InputRecorder.HEADER
+        magic, version, self.seed = header.unpack_from(data)
+        if magic != InputRecorder.MAGIC or version != InputRecorder.VERSION:
+            raise ValueError(f"{path} is not an input log")
+
+        self.runs = list(InputRecorder.RUN.iter_unpack(data[header.size:]))
+        self.frames = sum(run for _, run in self.runs)
+        self.run_index = 0
+        self.run_left = self.runs[0][1] if self.runs else 0
+        self.frame = 0
+
+    @property
+    def finished(self):
+        """
+        :return: have all the recorded frames been replayed
+        """
+        return self.frame >= self.frames
+
+    def poll(self):
+        """
+        :return: recorded controls for the next frame
+        """
+        if self.finished:
+            return 0
+
+        if self.run_left == 0:
+            self.run_index += 1
+            self.run_left = self.runs[self.run_index][1]
+
+        self.run_left -= 1
+        self.frame += 1
+        return self.runs[self.run_index][0]
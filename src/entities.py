@@ -2,7 +2,10 @@ import random
 
 import pygame
 
+import assets
+import audio
 import constants as c
+import controls
 from animator import Animation
 from constants import JUMP_HEIGHT
 
@@ -27,11 +30,34 @@ class Entity(pygame.sprite.Sprite):
         self.animation = animation
 
         self.image = self.animation.get_image()
-        self.rect = self.image.get_rect()
+        # The rect is in window coordinates, the image may be drawn at a lower resolution
+        self.rect = pygame.Rect((0, 0), assets.get_window_size(self.image))
         self.rect.center = pos
 
         self.collisions = collisions
 
+        self.sleeping = False
+        self.support = None
+
+    def get_state(self):
+        """
+        Capture the simulation state of the entity. The animation images are shared, so only referenced
+        :return: state tuple for set_state
+        """
+        animation = self.animation
+        return (self.rect.x, self.rect.y, self.velocity_x, self.velocity_y, self.collisions, self.sleeping,
+                self.support, animation.curr_state, animation.flipped, animation.images, animation.start)
+
+    def set_state(self, state):
+        """
+        Restore the simulation state of the entity
+        :param state: state returned by get_state
+        """
+        animation = self.animation
+        (self.rect.x, self.rect.y, self.velocity_x, self.velocity_y, self.collisions, self.sleeping,
+         self.support, animation.curr_state, animation.flipped, animation.images, animation.start) = state
+        self.image = animation.get_image()
+
     def scroll(self, dx):
         """
         Scroll the entity across the screen
@@ -43,11 +69,35 @@ class Entity(pygame.sprite.Sprite):
         """
         Apply movement to the entity, based on its velocity and position
         """
+        if self.sleeping:
+            if self.velocity_x == 0 and self.velocity_y == 0 and self.support.alive():
+                return
+            self.wake()
+
+        self.support = None
         if self.gravity:
             self.velocity_y += c.GRAVITY
         self.rect.y += self.velocity_y
         self.rect.x += self.velocity_x
 
+    def settle(self):
+        """
+        Put the entity to sleep if it is resting on a terrain block,
+        skipping gravity and terrain collisions until it moves again
+        """
+        if not c.SLEEP_ENTITIES or not self.gravity or self.support is None:
+            return
+
+        if self.velocity_x == 0 and self.velocity_y == 0 and self.rect.bottom == self.support.rect.top:
+            self.sleeping = True
+
+    def wake(self):
+        """
+        Wake up a sleeping entity
+        """
+        self.sleeping = False
+        self.support = None
+
     def update(self, move=True):
         """
         Update the entity - apply movement and update animation
@@ -56,7 +106,6 @@ class Entity(pygame.sprite.Sprite):
         if move:
             self.apply_movement()
 
-        self.animation.update()
         self.image = self.animation.get_image()
 
 
@@ -69,17 +118,18 @@ class Star(Entity):
     WAIT_TIME = 30
     MOVE_STEP = 12
 
-    def __init__(self, pos, bound_start, bound_end):
+    def __init__(self, pos, bound_start, bound_end, clock):
         """
         Initialize the star entity
         :param pos: initial position
         :param bound_start: left bound of the movement
         :param bound_end: right bound of the movement
+        :param clock: AnimationClock of the game
         """
         animation = Animation({
             'attack': 'resources/star/07-Attack',
             'idle': 'resources/star/01-Idle',
-        })
+        }, clock)
         super().__init__(animation, pos)
 
         self.bound_start = bound_start
@@ -110,6 +160,20 @@ class Star(Entity):
             self.animation.change_direction(True)
             self.pause()
 
+    def get_state(self):
+        """
+        :return: state tuple for set_state
+        """
+        return super().get_state(), self.bound_start, self.bound_end, self.wait_counter, self.paused
+
+    def set_state(self, state):
+        """
+        Restore the star state
+        :param state: state returned by get_state
+        """
+        base, self.bound_start, self.bound_end, self.wait_counter, self.paused = state
+        super().set_state(base)
+
     def pause(self):
         """
         Stop the star from moving
@@ -140,14 +204,15 @@ class Bullet(Entity):
     Bullet entity, fired by the seashell entity
     """
 
-    def __init__(self, pos):
+    def __init__(self, pos, clock):
         """
         Initialize the bullet entity
         :param pos: initial position
+        :param clock: AnimationClock of the game
         """
         animation = Animation({
             'idle': 'resources/seashell/bullet',
-        })
+        }, clock)
         super().__init__(animation, pos, False)
 
         self.velocity_x = -c.MOVE_STEP
@@ -170,16 +235,17 @@ class Shell(Entity):
 
     WAITING_TIME = 20
 
-    def __init__(self, pos):
+    def __init__(self, pos, clock):
         """
         Initialize the seashell entity
         :param pos: initial position
+        :param clock: AnimationClock of the game
         """
         animation = Animation({
             'idle': 'resources/seashell/idle',
             'bite': 'resources/seashell/bite',
             'shoot': 'resources/seashell/shoot',
-        })
+        }, clock)
         super().__init__(animation, pos, collisions=True)
 
         self.state = 'idle'
@@ -198,6 +264,20 @@ class Shell(Entity):
             self.next_state()
         self.timer += 1
 
+    def get_state(self):
+        """
+        :return: state tuple for set_state
+        """
+        return super().get_state(), self.state, self.timer, self.curr_state_timer
+
+    def set_state(self, state):
+        """
+        Restore the seashell state
+        :param state: state returned by get_state
+        """
+        base, self.state, self.timer, self.curr_state_timer = state
+        super().set_state(base)
+
     def next_state(self):
         """
         Switch the state of the seashell entity
@@ -215,7 +295,7 @@ class Shell(Entity):
             if self.state == 'shoot':
                 bullet_pos = list(self.rect.midleft)
                 bullet_pos[1] += 10
-                bullet = Bullet(bullet_pos)
+                bullet = Bullet(bullet_pos, self.animation.clock)
                 self.groups()[0].add(bullet)
 
             if self.state == 'bite':
@@ -230,14 +310,15 @@ class Ship(Entity):
 
     MOVE_STEP = 4
 
-    def __init__(self, pos, bound_start, bound_end):
+    def __init__(self, pos, bound_start, bound_end, clock):
         """
         Initialize the ship entity
         :param pos: initial position
         :param bound_start: left bound of the movement
         :param bound_end: right bound of the movement
+        :param clock: AnimationClock of the game
         """
-        animation = Animation({'ship': 'resources/ship/base'})
+        animation = Animation({'ship': 'resources/ship/base'}, clock)
         super().__init__(animation, pos, gravity=False, collisions=True)
 
         self.bound_start = bound_start
@@ -256,6 +337,20 @@ class Ship(Entity):
             self.velocity_x = self.MOVE_STEP
             self.animation.change_direction(False)
 
+    def get_state(self):
+        """
+        :return: state tuple for set_state
+        """
+        return super().get_state(), self.bound_start, self.bound_end
+
+    def set_state(self, state):
+        """
+        Restore the ship state
+        :param state: state returned by get_state
+        """
+        base, self.bound_start, self.bound_end = state
+        super().set_state(base)
+
     def scroll(self, dx):
         """
         Scroll the ship entity
@@ -273,15 +368,16 @@ class Crab(Entity):
     """
     WAIT_TIME = 30
 
-    def __init__(self, pos):
+    def __init__(self, pos, clock):
         """
         Initialize the crab entity
         :param pos: initial position
+        :param clock: AnimationClock of the game
         """
         animation = Animation({
             'attack': 'resources/crab/07-Attack',
             'idle': 'resources/crab/01-Idle',
-        })
+        }, clock)
         super().__init__(animation, pos)
 
         self.state = 'idle'
@@ -307,11 +403,26 @@ class Crab(Entity):
         """
         super().scroll(dx)
 
+    def get_state(self):
+        """
+        :return: state tuple for set_state
+        """
+        return super().get_state(), self.state, self.timer, self.curr_state_timer
+
+    def set_state(self, state):
+        """
+        Restore the crab state
+        :param state: state returned by get_state
+        """
+        base, self.state, self.timer, self.curr_state_timer = state
+        super().set_state(base)
+
     def next_state(self):
         if self.state == 'idle':
             self.state = 'attack'
             self.animation.change_state(self.state)
             self.curr_state_timer = self.animation.get_full_time() * 2
+            self.wake()
             self.velocity_y = -JUMP_HEIGHT
         else:
             self.state = 'idle'
@@ -324,31 +435,44 @@ class Player(Entity):
     Player entity
     """
 
-    def __init__(self, pos):
+    def __init__(self, pos, clock):
         animation = Animation({
             'idle': 'resources/player/01-Idle',
             'run': 'resources/player/02-Run',
-        })
+        }, clock)
         super().__init__(animation, pos)
 
-        self.bounce_sound = pygame.mixer.Sound('resources/sounds/bounce.mp3')
-        self.bounce_sound.set_volume(0.2)
+        self.bounce_sound = audio.load_sound('resources/sounds/bounce.mp3', 0.2)
 
         self.health = 100
         self.jumped = False
         self.inertia_x = 0
+        self.controls = 0
+
+    def get_state(self):
+        """
+        :return: state tuple for set_state
+        """
+        return super().get_state(), self.health, self.jumped, self.inertia_x, self.controls
+
+    def set_state(self, state):
+        """
+        Restore the player state
+        :param state: state returned by get_state
+        """
+        base, self.health, self.jumped, self.inertia_x, self.controls = state
+        super().set_state(base)
 
     def update(self, move=True):
         """
-        Update the player entity
+        Update the player entity, based on the controls set for the current frame
         """
 
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_a] or keys[pygame.K_LEFT]:
+        if self.controls & controls.LEFT:
             self.velocity_x = -c.MOVE_STEP
             self.animation.change_state('run')
             self.animation.change_direction(True)
-        elif keys[pygame.K_d] or keys[pygame.K_RIGHT]:
+        elif self.controls & controls.RIGHT:
             self.velocity_x = c.MOVE_STEP
             self.animation.change_state('run')
             self.animation.change_direction(False)
@@ -356,10 +480,10 @@ class Player(Entity):
             self.animation.change_state('idle')
             self.velocity_x = 0
 
-        if keys[pygame.K_SPACE] and self.velocity_y == 0 and not self.jumped:
+        if self.controls & controls.JUMP and self.velocity_y == 0 and not self.jumped:
             self.jumped = True
             self.velocity_y = -c.JUMP_HEIGHT
-            pygame.mixer.Sound.play(self.bounce_sound)
+            audio.play_sound(self.bounce_sound)
 
         self.velocity_x += self.inertia_x
         self.inertia_x = 0
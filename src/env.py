@@ -0,0 +1,282 @@
+import multiprocessing
+import os
+from array import array
+from multiprocessing import shared_memory
+
+import pygame
+
+import constants as c
+import controls
+from game import Game
+from observation import TileObserver
+
+VIEW_COLUMNS = c.WINDOW[0] // c.BLOCK_SIZE
+OBS_SIZE = 5 + VIEW_COLUMNS + 2
+NUM_ACTIONS = (controls.LEFT | controls.RIGHT | controls.JUMP) + 1
+
+
+class ActionInput:
+    """
+    Input source returning the action set by the environment
+    """
+    live = False
+
+    def __init__(self):
+        self.action = 0
+
+    def poll(self):
+        """
+        :return: controls for the current frame
+        """
+        return self.action
+
+
+def column_height(grid, col):
+    """
+    :param grid: chunk grid
+    :param col: column index
+    :return: number of terrain blocks in the column, 0 for a gap
+    """
+    for row_index, row in enumerate(grid):
+        if row[col]:
+            return len(grid) - row_index
+    return 0
+
+
+def write_observation(game, obs):
+    """
+    Write the observation of the current game state into a float buffer:
+    player position, velocity and health, terrain height of every visible column
+    and the offset to the nearest entity, all roughly normalized to [-1, 1]
+    :param game: game instance
+    :param obs: buffer of OBS_SIZE floats
+    """
+    player = game.player.rect
+    obs[0] = player.centerx / c.WINDOW[0]
+    obs[1] = player.bottom / c.WINDOW[1]
+    obs[2] = game.player.velocity_x / c.MOVE_STEP
+    obs[3] = game.player.velocity_y / c.JUMP_HEIGHT
+    obs[4] = game.player.health / 100
+
+    chunks = iter(game.chunks)
+    chunk = next(chunks)
+    for i in range(VIEW_COLUMNS):
+        x = i * c.BLOCK_SIZE + c.BLOCK_SIZE // 2
+        while chunk is not None and chunk.get_end_position() <= x:
+            chunk = next(chunks, None)
+        if chunk is None or chunk.position[0] > x:
+            obs[5 + i] = 0
+        else:
+            col = (x - chunk.position[0]) // c.BLOCK_SIZE
+            obs[5 + i] = column_height(chunk.grid, col) / c.CHUNK_HEIGHT
+
+    nearest = None
+    for chunk in game.chunks:
+        for entity in chunk.entities:
+            dist = abs(entity.rect.centerx - player.centerx)
+            if nearest is None or dist < nearest[0]:
+                nearest = (dist, entity.rect)
+    if nearest is None:
+        obs[5 + VIEW_COLUMNS] = obs[6 + VIEW_COLUMNS] = 0
+    else:
+        obs[5 + VIEW_COLUMNS] = (nearest[1].centerx - player.centerx) / c.WINDOW[0]
+        obs[6 + VIEW_COLUMNS] = (nearest[1].centery - player.centery) / c.WINDOW[1]
+
+
+class PirateEnv:
+    """
+    Programmatic environment around the game, stepped by actions instead of the keyboard.
+    An action is a bitmask of controls.LEFT, controls.RIGHT and controls.JUMP
+    """
+
+    def __init__(self, render=False, obs_buffer=None, tiles=False):
+        """
+        Initialize the environment. Without rendering, the game runs on SDL's dummy video driver
+        and without audio.
+        :param render: should the frames be drawn
+        :param obs_buffer: optional writable float buffer of OBS_SIZE items the observations are written to
+        :param tiles: should the tile observation (see observation.TileObserver) be kept up to date,
+         it is passed in the info dictionary under 'tiles'
+        """
+        if not render:
+            os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        pygame.display.init()
+        pygame.font.init()
+
+        self.render = render
+        self.obs = obs_buffer if obs_buffer is not None else array('f', bytes(OBS_SIZE * 4))
+        self.input = ActionInput()
+        self.game = Game(0, self.input)
+        self.prev_score = 0
+        self.tile_observer = TileObserver() if tiles else None
+
+    def reset(self, seed=None):
+        """
+        Start a new session
+        :param seed: RNG seed of the session
+        :return: initial observation
+        """
+        self.game.restart(seed)
+        self.prev_score = self.game.get_score()
+        write_observation(self.game, self.obs)
+        if self.tile_observer:
+            self.tile_observer.update(self.game)
+        return self.obs
+
+    def step(self, action):
+        """
+        Simulate a single frame
+        :param action: controls bitmask
+        :return: observation, reward (score increase), done (lost) and info dictionary
+        """
+        self.input.action = action
+        self.game.handle_loop(self.render)
+        if self.render:
+            # Show the frame and keep the window responding, the keyboard is not read
+            pygame.display.flip()
+            pygame.event.pump()
+
+        score = self.game.get_score()
+        reward = score - self.prev_score
+        self.prev_score = score
+
+        write_observation(self.game, self.obs)
+        info = {'score': score, 'health': self.game.player.health}
+        if self.tile_observer:
+            info['tiles'] = self.tile_observer.update(self.game)
+        return self.obs, reward, self.game.lost, info
+
+    def snapshot(self):
+        """
+        Capture the environment state, see Game.snapshot
+        :return: snapshot to restore
+        """
+        return self.game.snapshot(), self.prev_score
+
+    def restore(self, snapshot):
+        """
+        Return to a captured state, to branch the simulation from it
+        :param snapshot: snapshot returned by snapshot
+        :return: observation of the restored state
+        """
+        game_snapshot, self.prev_score = snapshot
+        self.game.restore(game_snapshot)
+        write_observation(self.game, self.obs)
+        if self.tile_observer:
+            self.tile_observer.update(self.game)
+        return self.obs
+
+
+def _worker(conn, shm_name, start, end):
+    """
+    Worker process running a slice of the environments of VecEnv
+    :param conn: pipe connection to the main process
+    :param shm_name: name of the shared observation memory
+    :param start: index of the first environment
+    :param end: index after the last environment
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    obs = shm.buf.cast('f')
+    envs = [PirateEnv(obs_buffer=obs[i * OBS_SIZE:(i + 1) * OBS_SIZE]) for i in range(start, end)]
+
+    try:
+        while True:
+            cmd, data = conn.recv()
+            if cmd == 'step':
+                rewards, dones = [], []
+                for env, action in zip(envs, data):
+                    _, reward, done, _ = env.step(action)
+                    if done:
+                        env.reset()
+                    rewards.append(reward)
+                    dones.append(done)
+                conn.send((rewards, dones))
+            elif cmd == 'reset':
+                for env, seed in zip(envs, data):
+                    env.reset(seed)
+                conn.send(None)
+            elif cmd == 'close':
+                break
+    finally:
+        for env in envs:
+            env.obs.release()
+        obs.release()
+        shm.close()
+        conn.close()
+
+
+class VecEnv:
+    """
+    Runs many environments across worker processes.
+    Observations are written by the workers directly into shared memory,
+    exposed as a memoryview of num_envs * OBS_SIZE floats (usable with numpy.frombuffer).
+    Environments that are done are reset automatically.
+    """
+
+    def __init__(self, num_envs, num_workers=None):
+        """
+        Start the worker processes
+        :param num_envs: number of environments
+        :param num_workers: number of worker processes, the number of CPUs by default
+        """
+        num_workers = min(num_envs, num_workers or os.cpu_count())
+        self.num_envs = num_envs
+        self.shm = shared_memory.SharedMemory(create=True, size=num_envs * OBS_SIZE * 4)
+        self.obs = self.shm.buf.cast('f')
+
+        ctx = multiprocessing.get_context('spawn')
+        self.slices = []
+        self.conns = []
+        self.workers = []
+        for i in range(num_workers):
+            start = num_envs * i // num_workers
+            end = num_envs * (i + 1) // num_workers
+            parent_conn, child_conn = ctx.Pipe()
+            worker = ctx.Process(target=_worker, args=(child_conn, self.shm.name, start, end), daemon=True)
+            worker.start()
+            child_conn.close()
+
+            self.slices.append((start, end))
+            self.conns.append(parent_conn)
+            self.workers.append(worker)
+
+    def reset(self, seeds=None):
+        """
+        Reset all environments
+        :param seeds: optional list of seeds, one per environment
+        :return: observations
+        """
+        seeds = seeds or [None] * self.num_envs
+        for conn, (start, end) in zip(self.conns, self.slices):
+            conn.send(('reset', seeds[start:end]))
+        for conn in self.conns:
+            conn.recv()
+        return self.obs
+
+    def step(self, actions):
+        """
+        Step all environments
+        :param actions: list of actions, one per environment
+        :return: observations, rewards and dones
+        """
+        for conn, (start, end) in zip(self.conns, self.slices):
+            conn.send(('step', actions[start:end]))
+
+        rewards, dones = [], []
+        for conn in self.conns:
+            worker_rewards, worker_dones = conn.recv()
+            rewards += worker_rewards
+            dones += worker_dones
+        return self.obs, rewards, dones
+
+    def close(self):
+        """
+        Stop the workers and free the shared memory
+        """
+        for conn in self.conns:
+            conn.send(('close', None))
+        for worker in self.workers:
+            worker.join()
+        self.obs.release()
+        self.shm.close()
+        self.shm.unlink()
@@ -1,16 +1,35 @@
+import argparse
 import random
 import sys
+import time
 
 import pygame
 
+import assets
+import audio
 import constants as c
+import controls
 import generator
-from animator import DamageOverlay
+from animator import AnimationClock, DamageOverlay
 from background import ScrollingBackground
+from chunkcost import ChunkCostModel
 from entities import Player
+from gcpolicy import GCPolicy, format_gc_report
+from latency import FramePacer, LatencyMeter, format_latency
+from memory import MemoryReporter, format_report
+from quality import QualityGovernor
+from render import LowResTarget, RenderList, TextureTarget
+from statehash import StateHashWriter
+from stats import frame_stats
+from templates import TemplateLibrary
 from terrain import Chunk
+from tracing import traced, tracer
 from ui import LostUI
 
+# Separate generator for purely visual randomness,
+# so that drawing frames does not affect the simulation
+effects_random = random.Random()
+
 
 def check_chunk_collisions(player, chunks):
     """
@@ -64,6 +83,7 @@ def check_single_collision(player, block):
             player.rect.bottom = block.rect.top
             player.velocity_y = 0
             player.jumped = False
+            player.support = block
         elif smallest_overlap == overlap_bottom:
             player.rect.top = block.rect.bottom
             player.velocity_y = 0
@@ -73,42 +93,50 @@ def check_single_collision(player, block):
     return False
 
 
-def handle_events():
+def handle_events(game):
     """
-    Handle pygame events
+    Handle pygame events, timestamping the key presses
+    :param game: game instance
     """
+    key_presses = 0
     for event in pygame.event.get():
-        if (event.type == pygame.QUIT or
+        if (event.type in (pygame.QUIT, pygame.WINDOWCLOSE) or
                 (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE)):
             pygame.quit()
             sys.exit()
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_F9:
+            game.print_memory_report()
+        elif event.type == pygame.KEYDOWN:
+            key_presses += 1
+    game.latency.events_read(key_presses)
 
 
-def screen_shake(screen, intensity=5):
+def get_shake_offset(intensity=5):
     """
-    Shake the screen
-    :param screen: screen instance
+    Get a random camera offset shaking the screen
     :param intensity: shake intensity
+    :return: camera offset (x, y)
     """
-    shake_x = random.randint(-intensity, intensity)
-    shake_y = random.randint(-intensity, intensity)
-    screen.blit(screen, (shake_x, shake_y))
+    shake_x = effects_random.randint(-intensity, intensity)
+    shake_y = effects_random.randint(-intensity, intensity)
+    return shake_x, shake_y
 
 
-def update_chunk(screen, chunk, player):
+def update_chunk(chunk, player):
     """
-    Draw, update and check collisions for a chunk
-    :param screen: screen instance
+    Update and check collisions for a chunk
     :param chunk: chunk object
     :param player: player sprite object
     :return:
     """
 
-    chunk.draw(screen)
     chunk.entities.update()
-    chunk.entities.draw(screen)
     for e in chunk.entities:
-        check_group_collisions(e, chunk.terrain_sprites)
+        if e.sleeping:
+            frame_stats.incr('entities_asleep')
+        else:
+            check_group_collisions(e, chunk.terrain_sprites)
+            e.settle()
         if e.collisions:
             check_single_collision(player, e)
 
@@ -118,32 +146,111 @@ def update_chunk(screen, chunk, player):
 
 
 class Game:
-    def __init__(self):
-        self.damage_sound = pygame.mixer.Sound('resources/sounds/damage.mp3')
-        self.loose_sound = pygame.mixer.Sound('resources/sounds/loose.mp3')
-        pygame.mixer.music.load('resources/sounds/music.mp3')
-        pygame.mixer.music.set_volume(0.5)
-        pygame.mixer.music.play(loops=1000)
+    def __init__(self, seed=None, input_source=None, recorder=None, templates=None, gc_policy=None):
+        """
+        Initialize the game
+        :param seed: RNG seed, a random one is picked if not given
+        :param input_source: source of the per-frame controls, keyboard by default
+        :param recorder: optional InputRecorder saving the controls of every frame
+        :param templates: optional TemplateLibrary the chunks are picked from
+        :param gc_policy: optional GCPolicy, freezing the loaded objects after each reset
+        """
+        self.input_source = input_source or controls.KeyboardInput()
+        self.recorder = recorder
+        self.templates = templates
+        self.gc_policy = gc_policy
+        self.controls = 0
+        self.memory_reporter = MemoryReporter(trace_heap=c.MEMORY_REPORT_INTERVAL > 0)
+        self.latency = LatencyMeter()
+        self.quality = QualityGovernor(enabled=c.ADAPTIVE_QUALITY)
+        # Each game has its own clock, so that games sharing a process animate at their own pace
+        self.animation_clock = AnimationClock()
+        # Measured times would make the generated chunks differ between a recording and its replay
+        self.chunk_cost = None
+        if c.CHUNK_COST_BUDGET:
+            self.chunk_cost = ChunkCostModel(c.ADAPTIVE_CHUNK_COSTS and self.input_source.live and not recorder)
+
+        self.init_display()
+        # The world is drawn through the render list, the HUD and the effects are drawn on top of it.
+        # The HUD is a fill and two blits of a text rendered every frame, batching it would gain nothing
+        self.render_list = RenderList(('background', 'terrain', 'entities'))
+        self.restart(seed)
+
+    def init_display(self):
+        """
+        Open the window and create the render target of the selected backend
+        """
+        self.window = c.WINDOW
+        if c.RENDER_BACKEND == 'surface':
+            self.display = pygame.display.set_mode(c.WINDOW)
+            pygame.display.set_caption("The pirate game")
+            # The images are loaded at the internal resolution of the render scale
+            if assets.get_render_scale() > 1:
+                self.screen = LowResTarget(self.display, assets.get_render_scale())
+            else:
+                self.screen = self.display
+        else:
+            # The renderer gets its own window, the display module only provides the pixel format
+            # the images are converted to
+            self.display = pygame.display.set_mode((1, 1), pygame.HIDDEN)
+            self.screen = TextureTarget(c.WINDOW, "The pirate game", c.RENDER_BACKEND == 'texture')
 
-        self.screen = pygame.display.set_mode(c.WINDOW)
-        self.window = self.screen.get_size()
-        pygame.display.set_caption("The pirate game")
+    def restart(self, seed=None):
+        """
+        Reseed the RNG and start a new session
+        :param seed: RNG seed, a random one is picked if not given
+        """
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        self.seed = seed
+        random.seed(seed)
+        self.reset()
+
+    @traced('Game.reset')
+    def reset(self):
+        """
+        Start a new session
+        """
+        self.damage_sound = audio.load_sound('resources/sounds/damage.mp3')
+        self.loose_sound = audio.load_sound('resources/sounds/loose.mp3')
+        audio.play_music('resources/sounds/music.mp3')
 
         self.all_sprites = pygame.sprite.Group()
         middle = [self.window[0] // 2, self.window[1] // 2]
-        self.player = Player(middle)
+        self.player = Player(middle, self.animation_clock)
         self.all_sprites.add(self.player)
 
-        self.background = ScrollingBackground(self.window)
+        self.background = ScrollingBackground(self.window, self.animation_clock)
         self.chunks = [Chunk(c.INITIAL_CHUNK_GRID, [0, 0])]
-        self.chunk_generator = generator.ChunkGenerator(self.window)
+        self.chunk_generator = generator.ChunkGenerator(self.window, self.animation_clock, self.templates,
+                                                        self.chunk_cost)
         self.red_overlay = DamageOverlay(self.window)
         self.lost_ui = LostUI(self.window)
+        self.apply_quality()
 
         self.lost = False
         self.damaged = False
         self.score = 0
 
+        if self.gc_policy:
+            self.gc_policy.freeze()
+
+    def apply_quality(self):
+        """
+        Apply the settings of the current quality level
+        """
+        settings = self.quality.settings
+        self.background.water_layers = settings['water_layers']
+        self.background.scroll_clouds = settings['scroll_clouds']
+
+    def record_frame_time(self, frame_ms):
+        """
+        Record the time spent on a frame, adapting the quality level to it
+        :param frame_ms: frame time in milliseconds
+        """
+        if self.quality.record(frame_ms):
+            self.apply_quality()
+
     def get_score(self):
         return self.score//64
 
@@ -152,21 +259,18 @@ class Game:
         Handle the lost state
         :return:
         """
-        self.lost_ui.draw(self.screen)
-        if self.lost_ui.on_click():
-            self.__init__()
+        if self.controls & controls.RESTART:
+            self.reset()
 
     def damage_player(self):
         """
-        Damage the player - reduce health, shake the screen,
-         add red overlay and play the damage sound
+        Damage the player - reduce health and play the damage sound,
+         the screen is shaken and tinted red when drawing the frame
         :return:
         """
         self.player.health -= 2
-        self.red_overlay.draw(self.screen)
-        screen_shake(self.screen)
         if not self.damaged:
-            pygame.mixer.Sound.play(self.damage_sound)
+            audio.play_sound(self.damage_sound)
 
         if self.player.health <= 0:
             self.loose()
@@ -178,10 +282,8 @@ class Game:
         """
         self.lost = True
         self.player.health = 0
-        self.background.draw_health_bar(self.screen, self.player.health)
-        self.red_overlay.draw(self.screen)
-        pygame.mixer.music.stop()
-        pygame.mixer.Sound.play(self.loose_sound)
+        audio.stop_music()
+        audio.play_sound(self.loose_sound)
 
     def scroll_map(self, player, chunks):
         """
@@ -195,6 +297,7 @@ class Game:
                 chunk.scroll(player.velocity_x)
             self.score += player.velocity_x
 
+    @traced('Game.generate_chunks')
     def generate_chunks(self, chunks):
         """
         Generate new chunks if needed and remove old chunks
@@ -212,15 +315,87 @@ class Game:
             chunk = chunks.pop(0)
             chunk.entities.remove()
 
-    def handle_loop(self):
+    def snapshot(self):
+        """
+        Capture the simulation state, to be restored later with restore, e.g. to branch the simulation.
+        Only the values that change during play are stored, the chunks, entities, grids and images are referenced.
+        Chunks generated after the snapshot are dropped on restore and generated again
+        :return: snapshot tuple
+        """
+        return (random.getstate(), self.animation_clock.ticks, self.score, self.lost, self.damaged, self.controls,
+                self.player.get_state(), [(chunk, chunk.get_state()) for chunk in self.chunks],
+                self.chunk_generator.get_state())
+
+    def restore(self, snapshot):
+        """
+        Restore the simulation state captured by snapshot, in the same session.
+        Sounds and music are not affected
+        :param snapshot: snapshot returned by snapshot
+        """
+        (rng_state, self.animation_clock.ticks, self.score, self.lost, self.damaged, self.controls,
+         player_state, chunk_states, generator_state) = snapshot
+        random.setstate(rng_state)
+        self.player.set_state(player_state)
+        self.chunks = [chunk for chunk, _ in chunk_states]
+        for chunk, chunk_state in chunk_states:
+            chunk.set_state(chunk_state)
+        self.chunk_generator.set_state(generator_state)
+
+    def print_memory_report(self):
+        """
+        Print a report of what holds memory
+        """
+        print(format_report(self.memory_reporter.report(self)))
+
+    @traced('Game.read_controls')
+    def read_controls(self):
+        """
+        Read the controls for the current frame from the input source and record them
+        :return: controls bitmask
+        """
+        frame_controls = self.input_source.poll()
+        if self.lost and self.input_source.live and self.lost_ui.on_click():
+            frame_controls |= controls.RESTART
+
+        if self.recorder:
+            self.recorder.record(frame_controls)
+        return frame_controls
+
+    def handle_loop(self, render=True):
         """
         Handle the main game loop
+        :param render: should the frame be drawn
         :return:
         """
+        self.controls = self.read_controls()
         if self.lost:
+            if render:
+                self.lost_ui.draw(self.screen)
+                self.present()
             self.handle_lost()
             return
 
+        self.update()
+        if render:
+            self.draw()
+            self.present()
+
+    @traced('Game.present')
+    def present(self):
+        """
+        Finish the frame of a render target - upscale it to the window, or show it in the renderer's window
+        """
+        if self.screen is not self.display:
+            self.screen.present()
+
+    @traced('Game.update')
+    def update(self):
+        """
+        Simulate a single frame
+        """
+        frame_stats.begin_frame()
+        self.animation_clock.tick()
+        self.player.controls = self.controls
         self.all_sprites.update()
         self.background.update()
 
@@ -228,21 +403,19 @@ class Game:
         self.generate_chunks(self.chunks)
         check_chunk_collisions(self.player, self.chunks)
 
-        self.background.draw(self.screen, self.player.health, self.get_score())
-
         collision = False
-        for chunk in self.chunks:
-            update_chunk(self.screen, chunk, self.player)
-
-            if pygame.sprite.spritecollide(self.player, chunk.entities, False):
-                collision = True
-
-            if c.DEBUG:
-                pygame.draw.line(self.screen,
-                                 (255, 0, 0),
-                                 (chunk.get_end_position(), 0), (chunk.get_end_position(), self.window[1]), 2)
-
-        self.all_sprites.draw(self.screen)
+        # The chunks are only timed when the measured times are used by the cost model
+        measure_costs = self.chunk_cost is not None and self.chunk_cost.adaptive
+        with tracer.span('update_chunks'):
+            for chunk in self.chunks:
+                if measure_costs:
+                    start = time.perf_counter()
+                update_chunk(chunk, self.player)
+
+                if pygame.sprite.spritecollide(self.player, chunk.entities, False):
+                    collision = True
+                if measure_costs and chunk.chunk_type:
+                    self.chunk_cost.record('update', chunk.chunk_type, (time.perf_counter() - start) * 1000)
 
         if collision:
             self.damage_player()
@@ -253,21 +426,179 @@ class Game:
         if self.player.rect.bottom >= self.window[1]:
             self.loose()
 
+        if c.MEMORY_REPORT_INTERVAL and frame_stats.frame % c.MEMORY_REPORT_INTERVAL == 0:
+            self.print_memory_report()
+
+    @traced('Game.draw')
+    def draw(self):
+        """
+        Draw the current frame, the world is drawn with the camera offset of the screen shake.
+        The blits are collected in the render list and submitted once per layer
+        """
+        settings = self.quality.settings
+        offset = (0, 0)
+        if self.damaged and settings['screen_shake']:
+            offset = get_shake_offset()
+
+        render_list = self.render_list
+        with tracer.span('draw_background'):
+            self.background.draw(render_list.get_layer('background'))
+
+        with tracer.span('draw_chunks'):
+            screen_rect = self.screen.get_rect()
+            terrain = render_list.get_layer('terrain')
+            entities = render_list.get_layer('entities')
+            measure_costs = self.chunk_cost is not None and self.chunk_cost.adaptive
+            chunk_blits = []
+            for chunk in self.chunks:
+                blits = len(terrain) + len(entities)
+                chunk.draw(terrain, screen_rect, offset)
+                chunk.draw_entities(entities, screen_rect, offset)
+                if measure_costs:
+                    chunk_blits.append((chunk.chunk_type, len(terrain) + len(entities) - blits))
+
+            for sprite in self.all_sprites:
+                entities.append((sprite.image, sprite.rect.move(offset)))
+            world_blits = len(terrain) + len(entities)
+
+        with tracer.span('submit_blits'):
+            render_list.submit(self.screen)
+
+        # The world is drawn in a single call per layer, each chunk is charged by its share of the blits
+        if chunk_blits and world_blits:
+            world_ms = (render_list.times['terrain'] + render_list.times['entities']) * 1000
+            for chunk_type, blits in chunk_blits:
+                if chunk_type:
+                    self.chunk_cost.record('draw', chunk_type, world_ms * blits / world_blits)
+
+        if c.DEBUG:
+            for chunk in self.chunks:
+                self.screen.fill((255, 0, 0), (chunk.get_end_position() - 1, 0, 2, self.window[1]))
+        self.background.draw_hud(self.screen, self.player.health, self.get_score())
+
+        effects_start = time.perf_counter()
+        with tracer.span('post_effects'):
+            if self.damaged:
+                if settings['damage_effect'] == 'overlay':
+                    self.red_overlay.draw(self.screen)
+                else:
+                    self.red_overlay.draw_border(self.screen)
+
+            if self.lost:
+                self.background.draw_health_bar(self.screen, self.player.health)
+                self.red_overlay.draw(self.screen)
+
+        if c.DEBUG:
+            frame_stats.set('effects_ms', round((time.perf_counter() - effects_start) * 1000, 2))
+            frame_stats.set('quality', settings['name'])
+            frame_stats.set('frame_ms', round(self.quality.get_average(), 1))
+            frame_stats.draw(self.screen)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="The pirate game")
+    parser.add_argument('--seed', type=int, help="RNG seed")
+    parser.add_argument('--record', metavar='PATH', help="record the controls of the session into a log")
+    parser.add_argument('--replay', metavar='PATH', help="replay a recorded log instead of reading the keyboard")
+    parser.add_argument('--fast', action='store_true', help="run without the frame cap")
+    parser.add_argument('--templates', metavar='PATH', help="pick chunks from a template library (see templates.py)")
+    parser.add_argument('--late-input', action='store_true',
+                        help="sleep before reading the input until just in time for the next flip deadline, "
+                             "reducing the input latency")
+    parser.add_argument('--backend', choices=['surface', 'texture', 'software'],
+                        help="render backend, see RENDER_BACKEND in constants.py")
+    parser.add_argument('--trace', metavar='PATH', help="write a Chrome trace of the game loop spans")
+    parser.add_argument('--trace-start', type=int, default=0, help="first traced frame")
+    parser.add_argument('--trace-frames', type=int, help="number of traced frames, until the exit by default")
+    parser.add_argument('--trace-hitch', type=float, metavar='MS',
+                        help="only trace the frames before each frame longer than MS milliseconds")
+    parser.add_argument('--render-scale', type=int,
+                        help="draw at a resolution this many times smaller and upscale it, "
+                             "must divide both window dimensions")
+    parser.add_argument('--hash', metavar='PATH',
+                        help="write a hash of the simulation state of every frame, to compare runs with statehash.py")
+    parser.add_argument('--chunk-budget', type=float, metavar='MS',
+                        help="keep the estimated cost of the chunks on the screen under MS milliseconds per frame, "
+                             "see CHUNK_COST_BUDGET in constants.py")
+    args = parser.parse_args()
+    if args.render_scale is not None and (args.render_scale < 1 or c.WINDOW[0] % args.render_scale
+                                          or c.WINDOW[1] % args.render_scale):
+        parser.error(f"--render-scale must be a positive integer dividing both window dimensions "
+                     f"{c.WINDOW[0]}x{c.WINDOW[1]}")
+    return args
+
 
 def main():
+    args = parse_args()
+    if args.render_scale:
+        c.RENDER_SCALE = args.render_scale
+    if args.backend:
+        c.RENDER_BACKEND = args.backend
+    if args.chunk_budget:
+        c.CHUNK_COST_BUDGET = args.chunk_budget
+
+    if args.trace:
+        tracer.configure(args.trace, args.trace_start, args.trace_frames, args.trace_hitch)
+
     pygame.display.init()
     pygame.font.init()
-    pygame.mixer.init()
+    audio.init_mixer()
 
-    game = Game()
+    replay = controls.InputReplay(args.replay) if args.replay else None
+    seed = replay.seed if replay else args.seed
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    recorder = controls.InputRecorder(args.record, seed) if args.record else None
+    hash_writer = StateHashWriter(args.hash, seed) if args.hash else None
 
-    clock = pygame.time.Clock()
-    while True:
-        handle_events()
-        game.handle_loop()
+    templates = TemplateLibrary.load(args.templates) if args.templates else None
+    gc_policy = GCPolicy() if c.GC_POLICY else None
+    game = Game(seed, replay, recorder, templates, gc_policy)
+    fps = 0 if args.fast else 60
 
-        pygame.display.flip()
-        clock.tick(60)
+    clock = pygame.time.Clock()
+    pacer = FramePacer(fps) if args.late_input else None
+    start = time.perf_counter()
+    try:
+        while not (replay and replay.finished):
+            if pacer:
+                pacer.wait()
+            frame_start = time.perf_counter()
+            tracer.begin_frame()
+            with tracer.span('handle_events'):
+                handle_events(game)
+            game.handle_loop()
+            if hash_writer:
+                hash_writer.record(game)
+
+            work_time = time.perf_counter() - frame_start
+            with tracer.span('flip'):
+                pygame.display.flip()
+            game.latency.frame_presented()
+            frame_time = time.perf_counter() - frame_start
+            game.record_frame_time(frame_time * 1000)
+            if gc_policy:
+                gc_policy.collect_idle(1 / fps - frame_time if fps else 0)
+            tracer.end_frame()
+            if pacer:
+                pacer.frame_done(work_time)
+            else:
+                clock.tick(fps)
+    finally:
+        tracer.close()
+        if recorder:
+            recorder.close()
+        if hash_writer:
+            hash_writer.close()
+        latency = game.latency.report()
+        if latency:
+            print(format_latency(latency))
+        if gc_policy:
+            print(format_gc_report(gc_policy.report()))
+            gc_policy.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Replayed {replay.frames} frames in {elapsed:.2f}s ({replay.frames / elapsed:.0f} fps)")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,125 @@
+import gc
+import time
+from collections import Counter
+
+from stats import frame_stats
+from tracing import tracer
+
+
+class GCPolicy:
+    """
+    Class keeping the cyclic garbage collector pauses out of the frames.
+    The objects alive after loading are frozen so that the collections skip them,
+    automatic collection is disabled during play and the generations are collected explicitly
+    in the idle time left at the end of a frame
+    """
+    # Young objects allocated before the youngest generation is collected
+    YOUNG_THRESHOLD = 700
+    # Collections of a generation before the next older one is collected
+    OLDER_THRESHOLD = 10
+    # Young objects allocated before a collection is run even without idle time
+    HARD_LIMIT = 100000
+
+    def __init__(self):
+        self.reason = None
+        self.start = 0
+        # Duration of the last collection of each generation, in seconds
+        self.durations = [0, 0, 0]
+        self.collections = Counter()
+        self.pause_ms = Counter()
+        self.max_ms = Counter()
+
+        gc.callbacks.append(self.on_collection)
+        gc.disable()
+
+    def close(self):
+        """
+        Restore automatic collection
+        """
+        gc.callbacks.remove(self.on_collection)
+        gc.unfreeze()
+        gc.enable()
+
+    def on_collection(self, phase, info):
+        """
+        Measure the collection pauses, called by the collector
+        :param phase: 'start' or 'stop'
+        :param info: collection info
+        """
+        if phase == 'start':
+            self.start = time.perf_counter()
+            return
+
+        end = time.perf_counter()
+        duration = end - self.start
+        self.durations[info['generation']] = duration
+        if tracer.enabled:
+            tracer.record(f"gc (generation {info['generation']})", self.start, end)
+
+        reason = self.reason or 'frame'
+        ms = duration * 1000
+        self.collections[reason] += 1
+        self.pause_ms[reason] += ms
+        self.max_ms[reason] = max(self.max_ms[reason], ms)
+        if reason != 'idle':
+            frame_stats.incr('gc_pauses')
+            frame_stats.incr('gc_ms', round(ms, 2))
+
+    def collect(self, generation, reason):
+        """
+        Run a collection
+        :param generation: generation to collect
+        :param reason: why the collection is run, used to group the pauses
+        """
+        self.reason = reason
+        gc.collect(generation)
+        self.reason = None
+
+    def freeze(self):
+        """
+        Collect everything and freeze the surviving objects, called after loading a session.
+        The objects frozen after the previous load are unfrozen first, so that the old session can be collected
+        """
+        gc.unfreeze()
+        self.collect(2, 'load')
+        gc.freeze()
+
+    def collect_idle(self, idle_time):
+        """
+        Collect the generation that is due if it fits in the idle time
+        :param idle_time: time left until the next frame, in seconds
+        """
+        young, young_collections, older_collections = gc.get_count()
+        if older_collections >= self.OLDER_THRESHOLD:
+            generation = 2
+        elif young_collections >= self.OLDER_THRESHOLD:
+            generation = 1
+        elif young >= self.YOUNG_THRESHOLD:
+            generation = 0
+        else:
+            return
+
+        if self.durations[generation] < idle_time:
+            self.collect(generation, 'idle')
+        elif young >= self.HARD_LIMIT:
+            self.collect(generation, 'forced')
+
+    def report(self):
+        """
+        :return: number of collections, total and longest pause in milliseconds by reason
+        """
+        return {reason: {'collections': count, 'total_ms': self.pause_ms[reason], 'max_ms': self.max_ms[reason]}
+                for reason, count in self.collections.items()}
+
+
+def format_gc_report(report):
+    """
+    Format a GC report for printing
+    :param report: report created by GCPolicy.report
+    :return: report text
+    """
+    lines = ["GC pauses:"]
+    for reason, pauses in report.items():
+        lines.append(f"  {reason}: {pauses['collections']} collections, "
+                     f"{pauses['total_ms']:.1f} ms total, longest {pauses['max_ms']:.2f} ms")
+    return '\n'.join(lines)
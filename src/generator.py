@@ -1,8 +1,11 @@
 import random
+from collections import Counter
 
 import constants as c
 import entities
+import reachability
 from terrain import Chunk
+from tracing import traced
 
 
 def generate_tower_grid():
@@ -110,82 +113,173 @@ def gen_gap_grid(min_width=2, max_width=5):
     return new_chunk_grid
 
 
-def gen_tower_chunk(pos, window):
+def gen_tower_layout(window):
+    """
+    Generates the layout of a chunk with towers
+    :param window: window dimensions
+    :return: (grid, entity spawns) layout, see build_chunk
+    """
+    return generate_tower_grid(), []
+
+
+def gen_star_layout(window):
+    """
+    Generates the layout of a chunk with star entity
+    :param window: window dimensions
+    :return: (grid, entity spawns) layout, see build_chunk
+    """
+    platform_height = random.randint(2, 3)
+    grid = gen_star_grid(platform_height)
+    star = ('star', 128, window[1] - platform_height * c.BLOCK_SIZE, 0, len(grid[0]) * c.BLOCK_SIZE)
+    return grid, [star]
+
+
+def gen_shell_layout(window):
+    """
+    Generates the layout of a chunk with shell entity
+    :param window: window dimensions
+    :return: (grid, entity spawns) layout, see build_chunk
+    """
+    platform_height = random.randint(2, 3)
+    grid = gen_shell_grid(platform_height)
+    shell_x = int(len(grid[0]) / 1.5) * c.BLOCK_SIZE - c.BLOCK_SIZE
+    shell = ('shell', shell_x, window[1] - platform_height * c.BLOCK_SIZE, 0, 0)
+    return grid, [shell]
+
+
+def gen_crab_layout(window):
+    """
+    Generates the layout of a chunk with a crab entity
+    :param window: window dimensions
+    :return: (grid, entity spawns) layout, see build_chunk
+    """
+    platform_height = random.randint(2, 3)
+    grid = gen_crab_grid(platform_height)
+    crab_x = int(len(grid[0]) / 1.5) * c.BLOCK_SIZE - c.BLOCK_SIZE
+    crab = ('crab', crab_x, window[1] - platform_height * c.BLOCK_SIZE, 0, 0)
+    return grid, [crab]
+
+
+def gen_gap_layout(window):
+    """
+    Generates the layout of an empty chunk
+    :param window: window dimensions
+    :return: (grid, entity spawns) layout, see build_chunk
+    """
+    return gen_gap_grid(), []
+
+
+def gen_ship_layout(window):
+    """
+    Generates the layout of a chunk with a ship entity
+    :param window: window dimensions
+    :return: (grid, entity spawns) layout, see build_chunk
+    """
+    grid = gen_gap_grid(10, 20)
+    ship = ('ship', 100, window[1] - 32, 0, len(grid[0]) * c.BLOCK_SIZE)
+    return grid, [ship]
+
+
+def spawn_entity(spawn, pos, clock):
+    """
+    Create an entity from its spawn spec
+    :param spawn: (kind, x, y, bound start, bound end), x and bounds relative to the chunk position
+    :param pos: chunk position
+    :param clock: AnimationClock of the game
+    :return: entity
+    """
+    kind, x, y, bound_start, bound_end = spawn
+    entity_pos = (pos[0] + x, y)
+    if kind == 'star':
+        return entities.Star(entity_pos, pos[0] + bound_start, pos[0] + bound_end, clock)
+    if kind == 'shell':
+        return entities.Shell(entity_pos, clock)
+    if kind == 'crab':
+        return entities.Crab(entity_pos, clock)
+    if kind == 'ship':
+        return entities.Ship(entity_pos, pos[0] + bound_start, pos[0] + bound_end, clock)
+    raise ValueError(f"Unknown entity kind: {kind}")
+
+
+def build_chunk(layout, pos, clock):
+    """
+    Create a chunk from its layout
+    :param layout: (grid, entity spawns) - terrain grid and a list of entity spawn specs, see spawn_entity
+    :param pos: chunk position
+    :param clock: AnimationClock of the game
+    :return: chunk
+    """
+    grid, spawns = layout
+    chunk = Chunk(grid, pos)
+    for spawn in spawns:
+        chunk.entities.add(spawn_entity(spawn, pos, clock))
+    return chunk
+
+
+def gen_tower_chunk(pos, window, clock):
     """
     Generates a chunk with towers
     :param pos: chunk position
     :param window: window dimensions
+    :param clock: AnimationClock of the game
     :return: generated chunk
     """
-    return Chunk(generate_tower_grid(), pos)
+    return build_chunk(gen_tower_layout(window), pos, clock)
 
 
-def gen_star_chunk(pos, window):
+def gen_star_chunk(pos, window, clock):
     """
     Generates a chunk with star entity
     :param pos: chunk position
     :param window: window dimensions
+    :param clock: AnimationClock of the game
     :return: generated chunk
     """
-    platform_height = random.randint(2, 3)
-    chunk = Chunk(gen_star_grid(platform_height), pos)
-    star_pos = (pos[0] + 128, window[1] - platform_height * c.BLOCK_SIZE)
-    star = entities.Star(star_pos, pos[0], chunk.get_end_position())
-    chunk.entities.add(star)
-    return chunk
+    return build_chunk(gen_star_layout(window), pos, clock)
 
 
-def gen_shell_chunk(pos, window):
+def gen_shell_chunk(pos, window, clock):
     """
     Generates a chunk with shell entity
     :param pos: chunk position
     :param window: window dimensions
+    :param clock: AnimationClock of the game
     :return: generated chunk
     """
-    platform_height = random.randint(2, 3)
-    chunk = Chunk(gen_shell_grid(platform_height), pos)
-    shell_pos = int(chunk.width / 1.5) * c.BLOCK_SIZE + pos[0] - c.BLOCK_SIZE, window[1] - platform_height * c.BLOCK_SIZE
-    shell = entities.Shell(shell_pos)
-    chunk.entities.add(shell)
-    return chunk
+    return build_chunk(gen_shell_layout(window), pos, clock)
 
 
-def gen_crab_chunk(pos, window):
+def gen_crab_chunk(pos, window, clock):
     """
     Generate a chunk with a crab entity
     :param pos: chunk position
     :param window: window dimensions
+    :param clock: AnimationClock of the game
     :return: generated chunk
     """
-    platform_height = random.randint(2, 3)
-    chunk = Chunk(gen_crab_grid(platform_height), pos)
-    crab_pos = int(chunk.width / 1.5) * c.BLOCK_SIZE + pos[0] - c.BLOCK_SIZE, window[1] - platform_height * c.BLOCK_SIZE
-    crab = entities.Crab(crab_pos)
-    chunk.entities.add(crab)
-    return chunk
+    return build_chunk(gen_crab_layout(window), pos, clock)
 
 
-def gen_gap_chunk(pos, window):
+def gen_gap_chunk(pos, window, clock):
     """
     Create an empty chunk
     :param pos: chunk position
     :param window: window dimensions
+    :param clock: AnimationClock of the game
     :return: generated chunk
     """
-    return Chunk(gen_gap_grid(), pos)
+    return build_chunk(gen_gap_layout(window), pos, clock)
 
 
-def gen_ship_chunk(pos, window):
+def gen_ship_chunk(pos, window, clock):
     """
     Create a chunk with a ship entity
     :param pos: chunk position
     :param window: window dimensions
+    :param clock: AnimationClock of the game
     :return: generated chunk
     """
-    chunk = Chunk(gen_gap_grid(10, 20), pos)
-    ship = entities.Ship((pos[0] + 100, window[1] - 32), pos[0], chunk.get_end_position())
-    chunk.entities.add(ship)
-    return chunk
+    return build_chunk(gen_ship_layout(window), pos, clock)
 
 
 CHUNK_TYPES = [
@@ -198,34 +292,171 @@ CHUNK_TYPES = [
     gen_tower_chunk
 ]
 
+CHUNK_LAYOUTS = {
+    gen_shell_chunk: gen_shell_layout,
+    gen_star_chunk: gen_star_layout,
+    gen_gap_chunk: gen_gap_layout,
+    gen_ship_chunk: gen_ship_layout,
+    gen_crab_chunk: gen_crab_layout,
+    gen_tower_chunk: gen_tower_layout,
+}
+
 
 class ChunkGenerator:
     """
     Class used for randomly generating new chunks
     """
 
-    def __init__(self, dims):
+    # How many times a chunk is regenerated when it is not traversable
+    MAX_ATTEMPTS = 10
+
+    def __init__(self, dims, clock, templates=None, cost_model=None):
+        """
+        Initialize the generator
+        :param dims: window dimensions
+        :param clock: AnimationClock of the game, animating the generated entities
+        :param templates: optional TemplateLibrary the chunk layouts are picked from,
+         instead of generating them
+        :param cost_model: optional ChunkCostModel, the chunk types are then picked so that the estimated cost
+         of the chunks on the screen stays under CHUNK_COST_BUDGET
+        """
         self.available_chunk_types = list(CHUNK_TYPES)
         self.prev_chunk = gen_gap_chunk
         self.window = dims
+        self.clock = clock
+        self.templates = templates
+        self.cost_model = cost_model
+        # Generated chunks that may still be on the screen
+        self.live_chunks = []
+        # Chunk types rejected while generating the current chunk
+        self.rejected = []
 
-    def gen_chunk(self, pos):
+        _, self.edge = reachability.validate_grid(c.INITIAL_CHUNK_GRID, (0, 0))
+        self.stats = Counter()
+
+        if cost_model and not cost_model.static:
+            cost_model.sample_layouts(CHUNK_LAYOUTS, self.gen_layout)
+
+    def get_available_chunk_types(self):
         """
-        Generate a random chunk, different from the previous one
-        :param pos: chunk position
-        :return: generated chunk
+        :return: chunk types that can follow the previous one
         """
-
+        self.available_chunk_types = list(CHUNK_TYPES)
         self.available_chunk_types.remove(self.prev_chunk)
         if self.prev_chunk == gen_gap_chunk:
             self.available_chunk_types.remove(gen_ship_chunk)
             self.available_chunk_types.remove(gen_tower_chunk)
         elif self.prev_chunk == gen_ship_chunk or self.prev_chunk == gen_tower_chunk:
             self.available_chunk_types.remove(gen_gap_chunk)
+        return self.available_chunk_types
 
-        choice = random.choice(self.available_chunk_types)
+    def get_live_cost(self):
+        """
+        :return: estimated cost of the generated chunks still on the screen, in milliseconds per frame
+        """
+        self.live_chunks = [chunk for chunk in self.live_chunks if chunk.get_end_position() > 0]
+        return sum(self.cost_model.estimate(chunk.chunk_type) for chunk in self.live_chunks)
 
-        self.available_chunk_types = list(CHUNK_TYPES)
+    def get_affordable_chunk_types(self, available):
+        """
+        Keep the chunk types that fit in the cost budget next to the chunks on the screen.
+        When none of them fits, the cheapest one is kept. The types rejected as not traversable
+        for the current chunk are skipped, so that the budget does not keep picking them
+        :param available: chunk types that can follow the previous one
+        :return: chunk types to pick from
+        """
+        if not self.cost_model or not c.CHUNK_COST_BUDGET:
+            return available
+
+        left = c.CHUNK_COST_BUDGET - self.get_live_cost()
+        affordable = [chunk_type for chunk_type in available if self.cost_model.estimate(chunk_type) <= left]
+        if len(affordable) == len(available):
+            return available
+
+        affordable = [chunk_type for chunk_type in affordable if chunk_type not in self.rejected]
+        if affordable:
+            self.stats['over_budget'] += 1
+            return affordable
+        self.stats['over_budget_cheapest'] += 1
+        candidates = [chunk_type for chunk_type in available if chunk_type not in self.rejected] or available
+        return [min(candidates, key=self.cost_model.estimate)]
+
+    def pick_chunk_type(self):
+        """
+        :return: randomly picked chunk type that can follow the previous one and fits in the cost budget
+        """
+        return random.choice(self.get_affordable_chunk_types(self.get_available_chunk_types()))
+
+    def gen_layout(self, chunk_type):
+        """
+        Generate a chunk layout, or pick one from the template library
+        :param chunk_type: chunk generating function
+        :return: (grid, entity spawns) layout
+        """
+        if self.templates:
+            return self.templates.sample(chunk_type.__name__)
+        return CHUNK_LAYOUTS[chunk_type](self.window)
+
+    def validate(self, chunk_type, grid):
+        """
+        Check if the player can get through the chunk from the end of the previous one
+        :param chunk_type: chunk generating function
+        :param grid: grid of the chunk
+        :return: (is the chunk traversable, edge at the end of the chunk)
+        """
+        if chunk_type == gen_ship_chunk:
+            return reachability.validate_bridge(self.edge)
+        return reachability.validate_grid(grid, self.edge)
+
+    @traced('gen_chunk')
+    def gen_chunk(self, pos):
+        """
+        Generate a random chunk, different from the previous one.
+        Chunks the player could not get through are rejected and generated again
+        :param pos: chunk position
+        :return: generated chunk
+        """
+
+        self.rejected = []
+        for _ in range(self.MAX_ATTEMPTS):
+            choice = self.pick_chunk_type()
+            layout = self.gen_layout(choice)
+            valid, edge = self.validate(choice, layout[0])
+            if valid:
+                break
+            self.rejected.append(choice)
+            self.stats['rejected'] += 1
+            self.stats[f'rejected_{choice.__name__}'] += 1
+        else:
+            # Out of attempts, keep the last chunk
+            self.stats['forced'] += 1
+
+        self.stats['generated'] += 1
         self.prev_chunk = choice
+        self.edge = edge
+
+        chunk = build_chunk(layout, pos, self.clock)
+        chunk.chunk_type = choice
+        self.live_chunks.append(chunk)
+        return chunk
+
+    def get_state(self):
+        """
+        :return: state the next chunk is generated from, for set_state
+        """
+        return self.prev_chunk, self.edge, list(self.live_chunks)
 
-        return choice(pos, self.window)
+    def set_state(self, state):
+        """
+        Restore the state the next chunk is generated from
+        :param state: state returned by get_state
+        """
+        self.prev_chunk, self.edge, live_chunks = state
+        self.live_chunks = list(live_chunks)
+
+    def get_rejection_rate(self):
+        """
+        :return: ratio of rejected chunks to all generated chunks (including the rejected ones)
+        """
+        attempts = self.stats['generated'] + self.stats['rejected']
+        return self.stats['rejected'] / attempts if attempts else 0
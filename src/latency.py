@@ -0,0 +1,121 @@
+import statistics
+import time
+from collections import deque
+
+from stats import percentile
+
+
+class LatencyMeter:
+    """
+    Class for measuring the input latency - the time from a key press to the flip of the frame that handled it.
+    Key events are timestamped when the event queue is read, so the press happened at some point
+    since the previous read. The latency is measured from both reads, giving its lower and upper bound
+    """
+    # Number of key presses the report is computed over
+    MAX_SAMPLES = 10000
+
+    def __init__(self):
+        self.last_read = None
+        self.pending = []
+        self.samples = deque(maxlen=self.MAX_SAMPLES)
+
+    def events_read(self, key_presses):
+        """
+        Timestamp the key presses read from the event queue
+        :param key_presses: number of key press events read
+        """
+        now = time.perf_counter()
+        since = self.last_read if self.last_read is not None else now
+        self.pending += [(since, now)] * key_presses
+        self.last_read = now
+
+    def frame_presented(self):
+        """
+        Measure the latency of the key presses handled by the flipped frame
+        """
+        if not self.pending:
+            return
+        now = time.perf_counter()
+        for since, read in self.pending:
+            self.samples.append(((now - read) * 1000, (now - since) * 1000))
+        self.pending.clear()
+
+    def report(self):
+        """
+        :return: median and p99 of the lower and upper latency bounds in milliseconds, None without key presses
+        """
+        if not self.samples:
+            return None
+        lower = sorted(sample[0] for sample in self.samples)
+        upper = sorted(sample[1] for sample in self.samples)
+        return {
+            'presses': len(self.samples),
+            'lower': {'median': statistics.median(lower), 'p99': percentile(lower, 99)},
+            'upper': {'median': statistics.median(upper), 'p99': percentile(upper, 99)},
+        }
+
+
+def format_latency(report):
+    """
+    Format a latency report for printing
+    :param report: report created by LatencyMeter.report
+    :return: report text
+    """
+    lower, upper = report['lower'], report['upper']
+    return (f"Input latency over {report['presses']} key presses: "
+            f"median {lower['median']:.1f}-{upper['median']:.1f} ms, p99 {lower['p99']:.1f}-{upper['p99']:.1f} ms")
+
+
+class FramePacer:
+    """
+    Class for pacing the frames against fixed flip deadlines, one per frame period.
+    Before each frame it sleeps until the estimated simulation and render time before the next deadline,
+    so the input is read as late as possible and the frame is ready to flip right at its deadline.
+    With vsync the flip blocks until the display refresh, which then sets the deadlines;
+    the blocked time is not part of the estimate, otherwise the estimate would grow to the whole period
+    and the pacer would never sleep
+    """
+    # Time left before the deadline on top of the estimated frame work, in seconds
+    MARGIN = 0.002
+    # Weight of the latest frame in the estimated frame work, when it is shorter than estimated
+    SMOOTHING = 0.1
+
+    def __init__(self, fps):
+        """
+        Initialize the pacer
+        :param fps: frame rate, 0 to run without a frame cap
+        """
+        self.period = 1 / fps if fps else 0
+        self.deadline = None
+        # Estimated time from reading the input to the flip, in seconds
+        self.work_time = 0
+
+    def wait(self):
+        """
+        Sleep until the input of the next frame should be read
+        """
+        if not self.period or self.deadline is None:
+            return
+        delay = self.deadline - self.work_time - self.MARGIN - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+    def frame_done(self, work_time):
+        """
+        Update the estimated frame work and move to the next flip deadline, called after the flip
+        :param work_time: time the frame took from reading the input to the start of the flip, in seconds
+        """
+        # Grow the estimate at once so that slow frames do not miss the deadline repeatedly
+        if work_time > self.work_time:
+            self.work_time = work_time
+        else:
+            self.work_time += (work_time - self.work_time) * self.SMOOTHING
+
+        if not self.period:
+            return
+        # A flip returning after the deadline was either blocked until the display refresh or late,
+        # the deadlines continue from it. Otherwise they stay on the fixed grid
+        now = time.perf_counter()
+        if self.deadline is None or self.deadline < now:
+            self.deadline = now
+        self.deadline += self.period
@@ -0,0 +1,169 @@
+import tracemalloc
+from collections import Counter, deque
+
+import assets
+
+# Number of consecutive reports a value has to grow in to be flagged as a leak
+LEAK_WINDOW = 5
+# Number of allocation sites listed in the heap growth
+HEAP_TOP = 5
+# The allocations of the reporter and of tracemalloc itself are left out of the heap figures
+HEAP_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+]
+
+
+def surface_bytes(surface):
+    """
+    :param surface: pygame surface
+    :return: number of bytes used by the pixels of the surface
+    """
+    return surface.get_pitch() * surface.get_height()
+
+
+class MemoryReporter:
+    """
+    Class for reporting what holds memory in the game:
+    pixel bytes of the surfaces by owner, sprite counts per chunk
+    and Python heap growth between reports (tracked with tracemalloc)
+    """
+
+    def __init__(self, trace_heap=False):
+        """
+        Initialize the reporter
+        :param trace_heap: should tracemalloc be started now, so that the heap is traced from the start,
+         it is started by the first report otherwise
+        """
+        self.snapshot = None
+        self.history = deque(maxlen=LEAK_WINDOW)
+        self.traced_from_start = trace_heap
+        if trace_heap and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def count_surfaces(self, game):
+        """
+        Sum the pixel bytes of the surfaces by owner, every surface is counted once
+        :param game: game instance
+        :return: (map of owner to pixel bytes, map of owner to surface count)
+        """
+        owners = [
+            ('screen', [game.display]),
+            ('background', game.background.get_surfaces()),
+            ('ui', game.lost_ui.get_surfaces() + game.red_overlay.get_surfaces()),
+            ('Player', game.player.animation.get_surfaces()),
+        ]
+        if game.screen is not game.display:
+            owners.append(('render target', game.screen.get_surfaces()))
+        for chunk in game.chunks:
+            owners.append(('terrain', [sprite.image for sprite in chunk.terrain_sprites]))
+            for entity in chunk.entities:
+                owners.append((type(entity).__name__, entity.animation.get_surfaces()))
+        owners.append(('asset cache (unreferenced)', assets.image_cache.values()))
+
+        pixel_bytes = Counter()
+        surfaces = Counter()
+        seen = set()
+        for owner, owned in owners:
+            for surface in owned:
+                if id(surface) in seen:
+                    continue
+                seen.add(id(surface))
+                pixel_bytes[owner] += surface_bytes(surface)
+                surfaces[owner] += 1
+        return pixel_bytes, surfaces
+
+    def count_heap(self):
+        """
+        Measure the Python heap, starting tracemalloc on the first call if it is not tracing yet
+        :return: (size of the traced allocations, peak traced size, largest allocation growths since
+         the previous report)
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(HEAP_FILTERS)
+        growth = []
+        if self.snapshot:
+            for stat in snapshot.compare_to(self.snapshot, 'lineno')[:HEAP_TOP]:
+                growth.append((str(stat.traceback), stat.size_diff))
+        self.snapshot = snapshot
+
+        current = sum(stat.size for stat in snapshot.statistics('filename'))
+        peak = tracemalloc.get_traced_memory()[1]
+        return current, peak, growth
+
+    def find_leaks(self, sprites, entity_counts, heap):
+        """
+        Flag values growing in each of the last LEAK_WINDOW reports
+        :param sprites: total number of sprites
+        :param entity_counts: number of entities of each class
+        :param heap: Python heap size
+        :return: list of warnings
+        """
+        self.history.append({'sprites': sprites, 'heap bytes': heap, **entity_counts})
+        if len(self.history) < LEAK_WINDOW:
+            return []
+
+        leaks = []
+        for name in self.history[-1]:
+            values = [report.get(name, 0) for report in self.history]
+            if all(a < b for a, b in zip(values, values[1:])):
+                leaks.append(f"{name} grew in each of the last {LEAK_WINDOW} reports ({values[0]} -> {values[-1]})")
+        return leaks
+
+    def report(self, game):
+        """
+        Create a memory report
+        :param game: game instance
+        :return: report dictionary
+        """
+        pixel_bytes, surfaces = self.count_surfaces(game)
+
+        chunks = []
+        entity_counts = Counter()
+        sprites = len(game.all_sprites)
+        for chunk in game.chunks:
+            chunk_entities = Counter(type(entity).__name__ for entity in chunk.entities)
+            entity_counts.update(chunk_entities)
+            sprites += len(chunk.terrain_sprites) + len(chunk.entities)
+            chunks.append({
+                'position': chunk.position[0],
+                'terrain': len(chunk.terrain_sprites),
+                'entities': dict(chunk_entities),
+            })
+
+        current, peak, growth = self.count_heap()
+        return {
+            'pixel_bytes': dict(pixel_bytes.most_common()),
+            'surfaces': dict(surfaces),
+            'chunks': chunks,
+            'sprites': sprites,
+            'entities': dict(entity_counts),
+            'heap': {'current': current, 'peak': peak, 'growth': growth, 'from_start': self.traced_from_start},
+            'leaks': self.find_leaks(sprites, entity_counts, current),
+        }
+
+
+def format_report(report):
+    """
+    Format a memory report for printing
+    :param report: report created by MemoryReporter.report
+    :return: report text
+    """
+    lines = ["Memory report", "Pixel bytes by owner:"]
+    for owner, size in report['pixel_bytes'].items():
+        lines.append(f"  {owner}: {size / 1024:.0f} KiB in {report['surfaces'][owner]} surfaces")
+    lines.append(f"Sprites: {report['sprites']}, entities: {report['entities']}")
+    for chunk in report['chunks']:
+        lines.append(f"  chunk at {chunk['position']}: {chunk['terrain']} terrain, entities {chunk['entities']}")
+
+    heap = report['heap']
+    since = "traced since startup" if heap['from_start'] else "traced since the first report"
+    lines.append(f"Python heap {since}: {heap['current'] / 1024:.0f} KiB (peak {heap['peak'] / 1024:.0f} KiB)")
+    for location, size_diff in heap['growth']:
+        lines.append(f"  {location}: {size_diff / 1024:+.1f} KiB")
+
+    for leak in report['leaks']:
+        lines.append(f"Possible leak: {leak}")
+    return '\n'.join(lines)
@@ -0,0 +1,132 @@
+import constants as c
+import entities
+
+TERRAIN_CHANNEL = 0
+ENTITY_CHANNELS = {
+    entities.Player: 1,
+    entities.Star: 2,
+    entities.Shell: 3,
+    entities.Crab: 4,
+    entities.Ship: 5,
+    entities.Bullet: 6,
+}
+# Channel of the entities of a type without a channel of its own or of a parent type
+OTHER_ENTITY_CHANNEL = 1 + len(ENTITY_CHANNELS)
+CHANNELS = 2 + len(ENTITY_CHANNELS)
+COLUMNS = c.WINDOW[0] // c.BLOCK_SIZE + 1
+ROWS = c.CHUNK_HEIGHT
+
+# Number of world columns kept in the terrain ring buffer,
+# enough for the viewport and the widest chunk generated ahead of it
+RING_COLUMNS = 128
+
+
+def get_entity_channel(entity):
+    """
+    :param entity: entity object
+    :return: channel of the entity's type, or of its closest parent type with a channel
+    """
+    for entity_type in type(entity).__mro__:
+        channel = ENTITY_CHANNELS.get(entity_type)
+        if channel is not None:
+            return channel
+    return OTHER_ENTITY_CHANNEL
+
+
+class TileObserver:
+    """
+    Low-resolution tile view of the viewport, with one byte per block-sized tile.
+    The terrain channel holds the chunk grid codes, every entity type has its own channel
+    set to 1 on the tiles the entity covers. Entity types missing from ENTITY_CHANNELS share the channel
+    of their closest parent type in it, or the last channel.
+
+    The tiles are aligned to the world columns, the first tile being the leftmost
+    (partially) visible column. Terrain columns are copied into a ring buffer once,
+    when their chunk is generated, so every update only copies the visible columns.
+
+    The data is laid out as (channel, column, row) in a preallocated buffer
+    that is updated in place, e.g. numpy.frombuffer(observer.buffer, numpy.uint8)
+    gives a zero-copy array of it.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray(CHANNELS * COLUMNS * ROWS)
+        self.view = memoryview(self.buffer)
+        self.tiles = self.view.cast('B', (CHANNELS, COLUMNS, ROWS))
+
+        self.ring = bytearray(RING_COLUMNS * ROWS)
+        self.ring_view = memoryview(self.ring)
+        self.empty_entities = bytes((CHANNELS - 1) * COLUMNS * ROWS)
+        self.last_chunk = None
+
+    def add_chunk(self, chunk, scroll):
+        """
+        Copy the terrain of a new chunk into the ring buffer
+        :param chunk: chunk object
+        :param scroll: total scroll of the map
+        """
+        first_col = (chunk.position[0] + scroll) // c.BLOCK_SIZE
+        for col in range(chunk.width):
+            offset = (first_col + col) % RING_COLUMNS * ROWS
+            for row in range(ROWS):
+                self.ring[offset + row] = chunk.grid[row][col]
+
+    def add_new_chunks(self, game):
+        """
+        Add the chunks generated since the last update
+        :param game: game instance
+        """
+        if game.chunks[-1] is self.last_chunk:
+            return
+
+        new_chunks = []
+        for chunk in reversed(game.chunks):
+            if chunk is self.last_chunk:
+                break
+            new_chunks.append(chunk)
+        else:
+            # The game was restarted
+            self.ring[:] = bytes(len(self.ring))
+
+        for chunk in new_chunks:
+            self.add_chunk(chunk, game.score)
+        self.last_chunk = game.chunks[-1]
+
+    def stamp(self, channel, rect, offset):
+        """
+        Mark the tiles covered by a rect
+        :param channel: entity channel
+        :param rect: entity rect in screen coordinates
+        :param offset: screen offset of the first tile
+        """
+        first_col = max(0, (rect.left + offset) // c.BLOCK_SIZE)
+        last_col = min(COLUMNS - 1, (rect.right - 1 + offset) // c.BLOCK_SIZE)
+        first_row = max(0, rect.top // c.BLOCK_SIZE)
+        last_row = min(ROWS - 1, (rect.bottom - 1) // c.BLOCK_SIZE)
+
+        base = channel * COLUMNS * ROWS
+        for col in range(first_col, last_col + 1):
+            for row in range(first_row, last_row + 1):
+                self.buffer[base + col * ROWS + row] = 1
+
+    def update(self, game):
+        """
+        Update the tiles to match the current game state
+        :param game: game instance
+        :return: the tiles, as a (channel, column, row) shaped memoryview
+        """
+        self.add_new_chunks(game)
+
+        first_col = game.score // c.BLOCK_SIZE
+        offset = game.score % c.BLOCK_SIZE
+        for i in range(COLUMNS):
+            ring_offset = (first_col + i) % RING_COLUMNS * ROWS
+            self.view[i * ROWS:(i + 1) * ROWS] = self.ring_view[ring_offset:ring_offset + ROWS]
+
+        self.view[COLUMNS * ROWS:] = self.empty_entities
+        self.stamp(ENTITY_CHANNELS[entities.Player], game.player.rect, offset)
+        for chunk in game.chunks:
+            for entity in chunk.entities:
+                self.stamp(get_entity_channel(entity), entity.rect, offset)
+
+        return self.tiles
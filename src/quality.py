@@ -0,0 +1,99 @@
+from collections import deque
+
+# Quality levels, from the best looking to the cheapest
+QUALITY_LEVELS = [
+    {
+        'name': 'high',
+        'water_layers': 3,
+        'scroll_clouds': True,
+        'damage_effect': 'overlay',
+        'screen_shake': True,
+    },
+    {
+        'name': 'medium',
+        'water_layers': 2,
+        'scroll_clouds': True,
+        'damage_effect': 'border',
+        'screen_shake': True,
+    },
+    {
+        'name': 'low',
+        'water_layers': 1,
+        'scroll_clouds': False,
+        'damage_effect': 'border',
+        'screen_shake': False,
+    },
+]
+
+
+class QualityGovernor:
+    """
+    Class for adapting the quality level to keep the frame time within budget.
+    It steps the quality down when the average frame time of the recent frames is over budget,
+    and back up when there is enough headroom
+    """
+    # Number of recent frames the average frame time is measured over
+    WINDOW = 30
+    # Minimum number of frames between two quality changes
+    COOLDOWN = 120
+    # Ratio of the budget the average frame time has to be under to step the quality up
+    HEADROOM = 0.6
+
+    def __init__(self, budget_ms=1000 / 60, enabled=True):
+        """
+        Initialize the governor
+        :param budget_ms: frame time budget in milliseconds
+        :param enabled: should the quality be adapted, the highest quality is used otherwise
+        """
+        self.budget_ms = budget_ms
+        self.enabled = enabled
+        self.level = 0
+        self.frame_times = deque(maxlen=self.WINDOW)
+        self.cooldown = 0
+
+    @property
+    def settings(self):
+        """
+        :return: settings of the current quality level
+        """
+        return QUALITY_LEVELS[self.level]
+
+    def get_average(self):
+        """
+        :return: average frame time of the recent frames in milliseconds
+        """
+        return sum(self.frame_times) / len(self.frame_times) if self.frame_times else 0
+
+    def record(self, frame_ms):
+        """
+        Record the time spent on a frame and adapt the quality level
+        :param frame_ms: frame time in milliseconds, without the time spent waiting for the next frame
+        :return: has the quality level changed
+        """
+        if not self.enabled:
+            return False
+
+        self.frame_times.append(frame_ms)
+        if self.cooldown > 0:
+            self.cooldown -= 1
+            return False
+        if len(self.frame_times) < self.WINDOW:
+            return False
+
+        average = self.get_average()
+        if average > self.budget_ms and self.level < len(QUALITY_LEVELS) - 1:
+            self.set_level(self.level + 1)
+            return True
+        if average < self.budget_ms * self.HEADROOM and self.level > 0:
+            self.set_level(self.level - 1)
+            return True
+        return False
+
+    def set_level(self, level):
+        """
+        Switch to another quality level
+        :param level: index of the quality level
+        """
+        self.level = level
+        self.frame_times.clear()
+        self.cooldown = self.COOLDOWN
@@ -0,0 +1,104 @@
+import constants as c
+
+# Widest gap (in columns) the jump table covers
+MAX_GAP = 16
+# How far the player can overhang a block edge while still standing on it,
+# or has to reach over the landing edge
+JUMP_OVERHANG = c.BLOCK_SIZE // 2
+# Collision resolution pushes the player on top of a block it runs into
+# if it is less than a single move step below the top of the block
+STEP_UP = c.MOVE_STEP - 1
+# Height of the ship deck, in blocks (rounded down)
+SHIP_DECK_HEIGHT = 1
+
+
+def jump_arc():
+    """
+    Simulate a jump with the player physics (see Player.update and Entity.apply_movement)
+    :return: list of (horizontal distance, rise) pairs for every frame until the player
+     falls below the bottom of the chunk
+    """
+    arc = []
+    x = rise = 0
+    velocity_y = -c.JUMP_HEIGHT
+    while rise > -c.CHUNK_HEIGHT * c.BLOCK_SIZE:
+        velocity_y += c.GRAVITY
+        rise -= velocity_y
+        x += c.MOVE_STEP
+        arc.append((x, rise))
+    return arc
+
+
+def build_jump_table():
+    """
+    Precompute which jumps are possible
+    :return: table indexed by [gap width][height delta + CHUNK_HEIGHT], gap width in columns
+     and height delta in blocks, True if the jump is possible
+    """
+    arc = jump_arc()
+    table = []
+    for gap in range(MAX_GAP + 1):
+        distance = gap * c.BLOCK_SIZE - JUMP_OVERHANG
+        # The highest point of the arc reached after travelling over the gap
+        max_rise = max((rise for x, rise in arc if x >= distance), default=None)
+
+        row = []
+        for height_delta in range(-c.CHUNK_HEIGHT, c.CHUNK_HEIGHT + 1):
+            row.append(max_rise is not None and height_delta * c.BLOCK_SIZE <= max_rise + STEP_UP)
+        table.append(row)
+    return table
+
+
+JUMP_TABLE = build_jump_table()
+
+
+def can_jump(height_delta, gap):
+    """
+    :param height_delta: height difference between the landing and the take-off column, in blocks
+    :param gap: number of gap columns between them
+    :return: can the player make the jump
+    """
+    return gap <= MAX_GAP and JUMP_TABLE[gap][height_delta + c.CHUNK_HEIGHT]
+
+
+def column_heights(grid):
+    """
+    :param grid: chunk grid
+    :return: number of terrain blocks in each column, 0 for gaps
+    """
+    heights = [0] * len(grid[0])
+    for row_index, row in enumerate(grid):
+        for col, cell in enumerate(row):
+            if cell and not heights[col]:
+                heights[col] = len(grid) - row_index
+    return heights
+
+
+def validate_grid(grid, edge):
+    """
+    Check if a chunk grid can be traversed from the end of the previous chunk
+    :param grid: chunk grid
+    :param edge: (height, gap) at the end of the previous chunk - height of the last
+     terrain column and number of gap columns after it
+    :return: (is the grid traversable, edge at the end of the grid)
+    """
+    valid = True
+    height, gap = edge
+    for column_height in column_heights(grid):
+        if not column_height:
+            gap += 1
+            continue
+        if not can_jump(column_height - height, gap):
+            valid = False
+        height, gap = column_height, 0
+    return valid, (height, gap)
+
+
+def validate_bridge(edge):
+    """
+    Check if a ship (bridge) chunk can be boarded from the end of the previous chunk
+    :param edge: (height, gap) at the end of the previous chunk
+    :return: (can the ship be boarded, edge at the end of the chunk - the ship deck)
+    """
+    height, gap = edge
+    return can_jump(SHIP_DECK_HEIGHT - height, gap), (SHIP_DECK_HEIGHT, 0)
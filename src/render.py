@@ -0,0 +1,261 @@
+import time
+import weakref
+
+import pygame
+from pygame._sdl2 import video
+
+# SDL blend modes of the textures, for the blending flags of Surface.blit
+SDL_BLENDMODE_ADD = 2
+SDL_BLENDMODE_MOD = 4
+BLEND_MODES = {pygame.BLEND_RGB_ADD: SDL_BLENDMODE_ADD, pygame.BLEND_RGB_MULT: SDL_BLENDMODE_MOD}
+
+
+class RenderList:
+    """
+    Blits collected during the frame and submitted with a single Surface.blits call per layer,
+    instead of a call from Python per sprite. The layers are drawn in the order they are given
+    """
+
+    def __init__(self, layers):
+        """
+        Initialize the render list
+        :param layers: names of the layers, from the bottom one to the top one
+        """
+        self.layers = {layer: [] for layer in layers}
+        # Time the last submit spent on each layer, in seconds
+        self.times = dict.fromkeys(layers, 0)
+
+    def get_layer(self, layer):
+        """
+        :param layer: layer name
+        :return: list of (surface, position) pairs of the layer, to be appended to
+        """
+        return self.layers[layer]
+
+    def submit(self, screen):
+        """
+        Draw all the layers and clear them for the next frame
+        :param screen: surface or render target to draw on
+        """
+        for layer, blits in self.layers.items():
+            start = time.perf_counter()
+            if blits:
+                screen.blits(blits, doreturn=False)
+                blits.clear()
+            self.times[layer] = time.perf_counter() - start
+
+
+class LowResTarget:
+    """
+    Render target drawing the frame into a small internal surface,
+    which is upscaled to the window once per frame.
+
+    Draw calls keep using window coordinates, while the surfaces are drawn as they are.
+    They must be made at the internal resolution - the images are loaded at it (see assets.load_image),
+    the other surfaces are created smaller by the render scale
+    """
+
+    def __init__(self, display, scale):
+        """
+        Initialize the render target
+        :param display: display surface the frame is presented on
+        :param scale: integer factor the internal resolution is smaller by
+        """
+        self.display = display
+        self.scale = scale
+        width, height = display.get_size()
+        self.surface = pygame.Surface((width // scale, height // scale)).convert()
+
+    def get_surfaces(self):
+        """
+        :return: the internal surface
+        """
+        return [self.surface]
+
+    def get_size(self):
+        return self.display.get_size()
+
+    def get_width(self):
+        return self.display.get_width()
+
+    def get_height(self):
+        return self.display.get_height()
+
+    def get_rect(self):
+        return self.display.get_rect()
+
+    def to_internal(self, pos):
+        """
+        :param pos: position or rect in window coordinates
+        :return: position in internal coordinates
+        """
+        return int(pos[0]) // self.scale, int(pos[1]) // self.scale
+
+    def to_window(self, rect):
+        """
+        :param rect: rect in internal coordinates
+        :return: rect in window coordinates
+        """
+        return pygame.Rect(rect.x * self.scale, rect.y * self.scale, rect.w * self.scale, rect.h * self.scale)
+
+    def blit(self, surface, pos, area=None, special_flags=0):
+        """
+        Draw a surface, same as Surface.blit
+        :param surface: surface at the internal resolution, or the render target itself
+        :param pos: position or rect in window coordinates
+        :param area: part of the surface to draw, in window coordinates
+        :param special_flags: blending flags
+        :return: affected rect in window coordinates
+        """
+        if surface is self:
+            surface = self.surface
+        if area is not None:
+            area = pygame.Rect(area)
+            area = pygame.Rect(self.to_internal(area.topleft), self.to_internal(area.size))
+        return self.to_window(self.surface.blit(surface, self.to_internal(pos), area, special_flags))
+
+    def blits(self, blit_sequence, doreturn=True):
+        """
+        Draw many surfaces at once, same as Surface.blits for (surface, position) pairs
+        :param blit_sequence: (surface at the internal resolution, position in window coordinates) pairs
+        :param doreturn: should the affected rects be returned
+        :return: affected rects in window coordinates, None if doreturn is false
+        """
+        scale = self.scale
+        sequence = [(surface, (int(pos[0]) // scale, int(pos[1]) // scale)) for surface, pos in blit_sequence]
+        rects = self.surface.blits(sequence, doreturn)
+        return [self.to_window(rect) for rect in rects] if doreturn else None
+
+    def fill(self, color, rect=None):
+        """
+        Fill the target or a part of it with a color
+        :param color: fill color
+        :param rect: rect in window coordinates, the whole target if not given
+        """
+        if rect is None:
+            self.surface.fill(color)
+            return
+        rect = pygame.Rect(rect)
+        x, y = self.to_internal(rect.topleft)
+        right, bottom = self.to_internal(rect.bottomright)
+        self.surface.fill(color, (x, y, right - x, bottom - y))
+
+    def present(self):
+        """
+        Upscale the internal surface to the display
+        """
+        pygame.transform.scale(self.surface, self.display.get_size(), self.display)
+
+
+class TextureTarget:
+    """
+    Render target composing the frame with an SDL renderer in its own window.
+    Each surface is uploaded as a texture the first time it is drawn and the texture lives as long as the surface,
+    so the surfaces must not be changed after they are drawn.
+    The GPU is used when available, SDL's software renderer otherwise
+    """
+
+    def __init__(self, size, title, accelerated=True):
+        """
+        Initialize the render target
+        :param size: window size
+        :param title: window title
+        :param accelerated: should a GPU renderer be tried before the software one
+        """
+        self.window = video.Window(title, size=size)
+        self.renderer = None
+        if accelerated:
+            try:
+                self.renderer = video.Renderer(self.window, accelerated=1)
+            except video.error:
+                pass
+        if self.renderer is None:
+            self.renderer = video.Renderer(self.window, accelerated=0)
+
+        # The frame is composed in a texture, so that it is kept between frames like a surface
+        self.frame = video.Texture(self.renderer, size, target=True)
+        self.renderer.target = self.frame
+        self.rect = pygame.Rect((0, 0), size)
+        self.textures = weakref.WeakKeyDictionary()
+
+    def get_surfaces(self):
+        """
+        :return: no surfaces, the textures are held by the renderer
+        """
+        return []
+
+    def get_size(self):
+        return self.rect.size
+
+    def get_width(self):
+        return self.rect.width
+
+    def get_height(self):
+        return self.rect.height
+
+    def get_rect(self):
+        return self.rect.copy()
+
+    def get_texture(self, surface):
+        """
+        Get the texture of a surface, uploading it on the first call
+        :param surface: surface
+        :return: texture
+        """
+        texture = self.textures.get(surface)
+        if texture is None:
+            texture = video.Texture.from_surface(self.renderer, surface)
+            self.textures[surface] = texture
+        return texture
+
+    def blit(self, surface, pos, area=None, special_flags=0):
+        """
+        Draw a surface, same as Surface.blit
+        :param surface: surface
+        :param pos: position or rect
+        :param area: part of the surface to draw
+        :param special_flags: blending flags, BLEND_RGB_ADD and BLEND_RGB_MULT are supported
+        :return: affected rect
+        """
+        texture = self.get_texture(surface)
+        area = pygame.Rect(area) if area is not None else texture.get_rect()
+        dest = pygame.Rect((int(pos[0]), int(pos[1])), area.size)
+        if special_flags:
+            blend_mode = texture.blend_mode
+            texture.blend_mode = BLEND_MODES[special_flags]
+            texture.draw(srcrect=area, dstrect=dest)
+            texture.blend_mode = blend_mode
+        else:
+            texture.draw(srcrect=area, dstrect=dest)
+        return dest.clip(self.rect)
+
+    def blits(self, blit_sequence, doreturn=True):
+        """
+        Draw many surfaces, same as Surface.blits. Each one is a separate draw call of the renderer
+        :param blit_sequence: (surface, position[, area[, blending flags]]) tuples
+        :param doreturn: should the affected rects be returned
+        :return: affected rects, None if doreturn is false
+        """
+        rects = [self.blit(*blit) for blit in blit_sequence]
+        return rects if doreturn else None
+
+    def fill(self, color, rect=None):
+        """
+        Fill the target or a part of it with a color
+        :param color: fill color
+        :param rect: rect to fill, the whole target if not given
+        """
+        self.renderer.draw_color = color
+        if rect is None:
+            self.renderer.clear()
+        else:
+            self.renderer.fill_rect(pygame.Rect(rect))
+
+    def present(self):
+        """
+        Show the frame in the window
+        """
+        self.renderer.target = None
+        self.frame.draw()
+        self.renderer.present()
+        self.renderer.target = self.frame
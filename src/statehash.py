@@ -0,0 +1,152 @@
+import argparse
+import random
+import struct
+import sys
+import zlib
+from array import array
+
+# Parts of the simulation state hashed every frame, in the order they are written
+FIELDS = (
+    'score',
+    'player_rect',
+    'player_velocity',
+    'player_health',
+    'chunk_positions',
+    'entity_rects',
+    'entity_velocities',
+    'rng',
+)
+
+
+def hash_values(values):
+    """
+    :param values: numbers
+    :return: 32-bit hash of the numbers
+    """
+    return zlib.crc32(array('d', values).tobytes())
+
+
+def hash_state(game):
+    """
+    Hash the simulation state of a frame, separately for each of the FIELDS
+    :param game: game instance
+    :return: tuple of 32-bit hashes
+    """
+    player = game.player
+    rects = []
+    velocities = []
+    for chunk in game.chunks:
+        for entity in chunk.entities:
+            rects += entity.rect
+            velocities += (entity.velocity_x, entity.velocity_y)
+
+    return (
+        hash_values((game.score,)),
+        hash_values(player.rect),
+        hash_values((player.velocity_x, player.velocity_y, player.inertia_x)),
+        hash_values((player.health,)),
+        hash_values([x for chunk in game.chunks for x in chunk.position]),
+        hash_values(rects),
+        hash_values(velocities),
+        zlib.crc32(array('I', random.getstate()[1]).tobytes()),
+    )
+
+
+class StateHashWriter:
+    """
+    Class for writing the per-frame hashes of the simulation state into a binary stream,
+    to check that a change to the engine does not change the simulation of a seeded or replayed run.
+    The stream starts with a header holding the RNG seed and the number of fields,
+    followed by a record of the frame number and the field hashes for every frame
+    """
+    MAGIC = b'PGSH'
+    VERSION = 1
+    HEADER = struct.Struct('<4sBqB')
+    FRAME = struct.Struct(f'<I{len(FIELDS)}I')
+
+    def __init__(self, path, seed):
+        """
+        Open the stream and write the header
+        :param path: stream file path
+        :param seed: RNG seed of the run
+        """
+        self.file = open(path, 'wb')
+        self.file.write(self.HEADER.pack(self.MAGIC, self.VERSION, seed, len(FIELDS)))
+        self.frames = 0
+
+    def record(self, game):
+        """
+        Write the hashes of the current frame
+        :param game: game instance
+        """
+        self.file.write(self.FRAME.pack(self.frames, *hash_state(game)))
+        self.frames += 1
+
+    def close(self):
+        """
+        Close the stream
+        """
+        self.file.close()
+
+
+def load_hashes(path):
+    """
+    Load a stream written by StateHashWriter
+    :param path: stream file path
+    :return: (seed, list of (frame, field hashes) records)
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    header = StateHashWriter.HEADER
+    magic, version, seed, fields = header.unpack_from(data)
+    if magic != StateHashWriter.MAGIC or version != StateHashWriter.VERSION or fields != len(FIELDS):
+        raise ValueError(f"{path} is not a state hash stream")
+    records = [(record[0], record[1:]) for record in StateHashWriter.FRAME.iter_unpack(data[header.size:])]
+    return seed, records
+
+
+def compare_hashes(reference, other):
+    """
+    Find the first frame two hash streams differ at
+    :param reference: records of the reference stream, see load_hashes
+    :param other: records of the compared stream
+    :return: (frame, names of the differing fields) of the first differing frame, None if the streams match.
+     The fields are empty when one stream ends before the other
+    """
+    for (frame, hashes), (_, other_hashes) in zip(reference, other):
+        if hashes != other_hashes:
+            return frame, [field for field, a, b in zip(FIELDS, hashes, other_hashes) if a != b]
+    if len(reference) != len(other):
+        return min(len(reference), len(other)), []
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two state hash streams written with game.py --hash")
+    parser.add_argument('reference', help="stream of the reference run")
+    parser.add_argument('other', help="stream of the compared run")
+    args = parser.parse_args()
+
+    seed, reference = load_hashes(args.reference)
+    other_seed, other = load_hashes(args.other)
+    if seed != other_seed:
+        print(f"The runs have different seeds: {seed} and {other_seed}")
+        sys.exit(1)
+
+    divergence = compare_hashes(reference, other)
+    if divergence is None:
+        print(f"The streams match over {len(reference)} frames")
+        return
+
+    frame, fields = divergence
+    if fields:
+        print(f"First divergence at frame {frame}: {', '.join(fields)}")
+    else:
+        print(f"The streams match until frame {frame}, where one of them ends "
+              f"({len(reference)} and {len(other)} frames)")
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
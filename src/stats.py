@@ -0,0 +1,73 @@
+import pygame
+
+import assets
+
+
+def percentile(values, p):
+    """
+    :param values: sorted values
+    :param p: percentile (0-100)
+    :return: the value at the given percentile
+    """
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+class FrameStats:
+    """
+    Class for collecting per-frame counters,
+    shown in the debug overlay
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.frame = 0
+        self.font = None
+
+    def begin_frame(self):
+        """
+        Reset all counters at the start of a new frame
+        """
+        self.frame += 1
+        for k in self.counters:
+            self.counters[k] = 0
+
+    def incr(self, name, amount=1):
+        """
+        Increase a counter
+        :param name: counter name
+        :param amount: value to add
+        """
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set(self, name, value):
+        """
+        Set a value shown along with the counters
+        :param name: value name
+        :param value: value to show
+        """
+        self.counters[name] = value
+
+    def get(self, name):
+        """
+        :param name: counter name
+        :return: current value of the counter
+        """
+        return self.counters.get(name, 0)
+
+    def draw(self, screen, pos=(20, 80)):
+        """
+        Draw the counters in the top left corner
+        :param screen: screen instance
+        :param pos: position of the first line
+        """
+        if self.font is None:
+            self.font = pygame.font.Font(None, 24 // assets.get_render_scale())
+
+        x, y = pos
+        for name, value in self.counters.items():
+            text = self.font.render(f"{name}: {value}", True, (255, 255, 255))
+            screen.blit(text, (x, y))
+            y += assets.get_window_size(text)[1]
+
+
+frame_stats = FrameStats()
@@ -0,0 +1,256 @@
+import argparse
+import csv
+import json
+import random
+import statistics
+import time
+
+import batch
+import constants as c
+import env
+import reachability
+from entities import Bullet
+from generator import ChunkGenerator, CHUNK_LAYOUTS
+
+# Default stress scenario, a config file overrides any of the keys
+DEFAULT_CONFIG = {
+    # Weights of the chunk types, by short name (see batch.chunk_type_name)
+    'weights': {'shell': 3, 'star': 3, 'crab': 3, 'tower': 2, 'gap': 0, 'ship': 1},
+    # Entities in each chunk that has entities, at the start of the run
+    'entities_per_chunk': 1,
+    # Entities added to each chunk every ramp_frames frames
+    'ramp_step': 2,
+    'ramp_frames': 600,
+    'max_entities_per_chunk': 40,
+    'frames': 12000,
+    # Frames averaged into a single sample
+    'sample_frames': 60,
+}
+
+# How much a subsystem's cost may exceed its linear fit before it is no longer considered linear
+NONLINEAR_TOLERANCE = 0.25
+# Sprite count each subsystem's cost is fitted against - the simulation only moves the player and the entities,
+# while every sprite on the screen is drawn
+SUBSYSTEMS = {'update_ms': 'moving', 'draw_ms': 'sprites'}
+
+
+class StressGenerator(ChunkGenerator):
+    """
+    Chunk generator picking the chunk types by configured weights
+    and filling the chunks with entities with more copies of them.
+    The rules on which chunk types can follow each other still apply
+    """
+
+    def __init__(self, dims, clock, weights, entities_per_chunk=1):
+        """
+        Initialize the generator
+        :param dims: window dimensions
+        :param clock: AnimationClock of the game, animating the generated entities
+        :param weights: map of short chunk type names to weights
+        :param entities_per_chunk: number of entities in each chunk that has entities
+        """
+        super().__init__(dims, clock)
+        self.weights = {chunk_type: weights.get(batch.chunk_type_name(chunk_type), 0) for chunk_type in CHUNK_LAYOUTS}
+        self.entities_per_chunk = entities_per_chunk
+
+    def pick_chunk_type(self):
+        """
+        :return: chunk type picked by weight among the ones that can follow the previous one
+        """
+        available = self.get_available_chunk_types()
+        weights = [self.weights[chunk_type] for chunk_type in available]
+        if not any(weights):
+            return random.choice(available)
+        return random.choices(available, weights)[0]
+
+    def gen_layout(self, chunk_type):
+        """
+        Generate a chunk layout, adding copies of its entities on the columns of the same height
+        :param chunk_type: chunk generating function
+        :return: (grid, entity spawns) layout
+        """
+        grid, spawns = super().gen_layout(chunk_type)
+        extra = self.entities_per_chunk - len(spawns)
+        if not spawns or extra <= 0:
+            return grid, spawns
+
+        heights = reachability.column_heights(grid)
+        dense = list(spawns)
+        for i in range(extra):
+            kind, x, y, bound_start, bound_end = spawns[i % len(spawns)]
+            platform = (self.window[1] - y) // c.BLOCK_SIZE
+            columns = [col for col, height in enumerate(heights) if height == platform] or [x // c.BLOCK_SIZE]
+            col = columns[i * len(columns) // extra]
+            dense.append((kind, col * c.BLOCK_SIZE + c.BLOCK_SIZE // 2, y, bound_start, bound_end))
+        return grid, dense
+
+
+def get_density(config, frame):
+    """
+    :param config: stress config
+    :param frame: frame number
+    :return: number of entities per chunk at the frame
+    """
+    density = config['entities_per_chunk'] + frame // config['ramp_frames'] * config['ramp_step']
+    return min(density, config['max_entities_per_chunk'])
+
+
+def count_sprites(game):
+    """
+    :param game: game instance
+    :return: (terrain sprites, entities, bullets) alive in the game
+    """
+    terrain = entities = bullets = 0
+    for chunk in game.chunks:
+        terrain += len(chunk.terrain_sprites)
+        for entity in chunk.entities:
+            if isinstance(entity, Bullet):
+                bullets += 1
+            else:
+                entities += 1
+    return terrain, entities, bullets
+
+
+def run_stress(config, seed=0, draw=True):
+    """
+    Run the stress scenario with the bot policy, keeping the player alive.
+    The session is restarted when the player falls into the water
+    :param config: stress config
+    :param seed: RNG seed
+    :param draw: should the frames be drawn
+    :return: list of samples, each averaged over config['sample_frames'] frames
+    """
+    e = env.PirateEnv()
+    game = e.game
+
+    def restart(session_seed, frame):
+        obs = e.reset(session_seed)
+        game.chunk_generator = StressGenerator(game.window, game.animation_clock, config['weights'],
+                                               get_density(config, frame))
+        return obs
+
+    obs = restart(seed, 0)
+    restarts = 0
+    samples = []
+    window = []
+    for frame in range(config['frames']):
+        game.chunk_generator.entities_per_chunk = get_density(config, frame)
+        game.player.health = 100
+        e.input.action = batch.bot_policy(obs)
+        game.controls = game.read_controls()
+
+        start = time.perf_counter()
+        game.update()
+        updated = time.perf_counter()
+        if draw:
+            game.draw()
+        drawn = time.perf_counter()
+
+        window.append(count_sprites(game) + ((updated - start) * 1000, (drawn - updated) * 1000))
+        if len(window) == config['sample_frames']:
+            terrain, entities, bullets, update_ms, draw_ms = (statistics.mean(values) for values in zip(*window))
+            samples.append({
+                'frame': frame + 1,
+                'density': game.chunk_generator.entities_per_chunk,
+                'sprites': terrain + entities + bullets + 1,
+                'moving': entities + bullets + 1,
+                'terrain': terrain,
+                'entities': entities,
+                'bullets': bullets,
+                'update_ms': update_ms,
+                'draw_ms': draw_ms,
+                'frame_ms': update_ms + draw_ms,
+                'restarts': restarts,
+            })
+            window = []
+
+        if game.lost:
+            restarts += 1
+            obs = restart(seed + restarts, frame)
+        else:
+            env.write_observation(game, obs)
+    return samples
+
+
+def find_nonlinear(samples, levels, key, count_key):
+    """
+    Find the first density level a subsystem's cost is no longer linear in the live sprite count at.
+    The cost is fitted on the samples of the lower half of the density levels
+    :param samples: samples returned by run_stress
+    :param levels: per density level results, see summarize_stress
+    :param key: cost field
+    :param count_key: sprite count field
+    :return: density of the first level over the linear fit by more than the tolerance, None if the cost stays linear
+    """
+    if len(levels) < 4:
+        return None
+    fit_density = levels[len(levels) // 2 - 1]['density']
+    fit = [sample for sample in samples if sample['density'] <= fit_density]
+    slope, intercept = statistics.linear_regression([sample[count_key] for sample in fit],
+                                                    [sample[key] for sample in fit])
+    for level in levels:
+        expected = intercept + slope * level[count_key]
+        if level[key] > expected * (1 + NONLINEAR_TOLERANCE):
+            return level['density']
+    return None
+
+
+def summarize_stress(samples):
+    """
+    Average the samples by density level and find where each subsystem stops scaling linearly
+    :param samples: samples returned by run_stress
+    :return: report dictionary
+    """
+    by_density = {}
+    for sample in samples:
+        by_density.setdefault(sample['density'], []).append(sample)
+
+    levels = []
+    for density, level_samples in sorted(by_density.items()):
+        level = {'density': density}
+        for key in ('sprites', 'moving', 'entities', 'bullets', 'update_ms', 'draw_ms', 'frame_ms'):
+            level[key] = statistics.mean(sample[key] for sample in level_samples)
+        levels.append(level)
+
+    nonlinear = {key: find_nonlinear(samples, levels, key, count_key) for key, count_key in SUBSYSTEMS.items()}
+    broken = [(density, key) for key, density in nonlinear.items() if density is not None]
+    return {
+        'levels': levels,
+        'nonlinear_at': nonlinear,
+        'breaks_first': min(broken)[1] if broken else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a stress scenario with a ramping world density")
+    parser.add_argument('--config', metavar='PATH', help="JSON file overriding the default stress config")
+    parser.add_argument('--seed', type=int, default=0, help="RNG seed")
+    parser.add_argument('--no-draw', action='store_true', help="only simulate the frames")
+    parser.add_argument('--csv', metavar='PATH', help="write the samples to a CSV file")
+    args = parser.parse_args()
+
+    config = dict(DEFAULT_CONFIG)
+    if args.config:
+        with open(args.config) as f:
+            config.update(json.load(f))
+
+    samples = run_stress(config, args.seed, not args.no_draw)
+    if args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.DictWriter(f, list(samples[0]))
+            writer.writeheader()
+            writer.writerows(samples)
+
+    report = summarize_stress(samples)
+    print(f"{'density':>7} {'sprites':>8} {'entities':>8} {'bullets':>7} {'update ms':>9} {'draw ms':>8}")
+    for level in report['levels']:
+        print(f"{level['density']:>7} {level['sprites']:>8.0f} {level['entities']:>8.0f} {level['bullets']:>7.1f} "
+              f"{level['update_ms']:>9.2f} {level['draw_ms']:>8.2f}")
+    for key, density in report['nonlinear_at'].items():
+        print(f"{key}: " + (f"no longer linear at density {density}" if density is not None else "linear"))
+    if report['breaks_first']:
+        print(f"Breaks first: {report['breaks_first']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+import argparse
+import random
+import struct
+
+import constants as c
+import generator
+
+ENTITY_KINDS = ('star', 'shell', 'crab', 'ship')
+
+
+class TemplateLibrary:
+    """
+    Library of pregenerated chunk layouts, sampled at runtime instead of generating new ones.
+
+    Binary format (little endian):
+     header - magic, version, window height the layouts were generated for, number of chunk types
+     for each chunk type - name length, name, number of templates
+     for each template - width, height, grid cells (row by row), number of entity spawns
+     for each spawn - entity kind index, x, y, bound start, bound end
+    """
+    MAGIC = b'PGTL'
+    VERSION = 1
+    HEADER = struct.Struct('<4sBHH')
+    TYPE = struct.Struct('<B')
+    COUNT = struct.Struct('<I')
+    TEMPLATE = struct.Struct('<BB')
+    SPAWN = struct.Struct('<Bhhhh')
+
+    def __init__(self, templates, window_height=c.WINDOW[1]):
+        """
+        Initialize the library
+        :param templates: map of chunk type names (e.g. 'gen_star_chunk') to lists of layouts
+        :param window_height: window height the layouts were generated for
+        """
+        self.templates = templates
+        self.window_height = window_height
+
+    def sample(self, chunk_type_name):
+        """
+        Pick a random layout of a chunk type. The layouts are shared and must not be modified
+        :param chunk_type_name: name of the chunk generating function
+        :return: (grid, entity spawns) layout
+        """
+        return random.choice(self.templates[chunk_type_name])
+
+    @classmethod
+    def build(cls, samples, window=c.WINDOW):
+        """
+        Sample the procedural chunk generators into a library
+        :param samples: number of layouts sampled per chunk type, duplicates are kept once
+        :param window: window dimensions
+        :return: template library
+        """
+        templates = {}
+        for chunk_type, gen_layout in generator.CHUNK_LAYOUTS.items():
+            unique = {}
+            for _ in range(samples):
+                grid, spawns = gen_layout(window)
+                key = (tuple(map(tuple, grid)), tuple(spawns))
+                unique.setdefault(key, (grid, spawns))
+            templates[chunk_type.__name__] = list(unique.values())
+        return cls(templates, window[1])
+
+    def save(self, path):
+        """
+        Write the library to a file
+        :param path: file path
+        """
+        with open(path, 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.VERSION, self.window_height, len(self.templates)))
+            for name, layouts in self.templates.items():
+                encoded_name = name.encode()
+                f.write(self.TYPE.pack(len(encoded_name)))
+                f.write(encoded_name)
+                f.write(self.COUNT.pack(len(layouts)))
+                for grid, spawns in layouts:
+                    f.write(self.TEMPLATE.pack(len(grid[0]), len(grid)))
+                    f.write(bytes(cell for row in grid for cell in row))
+                    f.write(self.TYPE.pack(len(spawns)))
+                    for kind, *spawn in spawns:
+                        f.write(self.SPAWN.pack(ENTITY_KINDS.index(kind), *spawn))
+
+    @classmethod
+    def load(cls, path, window=c.WINDOW):
+        """
+        Read a library written by save
+        :param path: file path
+        :param window: window dimensions the library must have been built for
+        :return: template library
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        magic, version, window_height, type_count = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError(f"{path} is not a chunk template library")
+        if window_height != window[1]:
+            raise ValueError(f"{path} was built for a window height of {window_height}, "
+                             f"the window is {window[1]} high - rebuild the library")
+        offset = cls.HEADER.size
+
+        templates = {}
+        for _ in range(type_count):
+            name_length, = cls.TYPE.unpack_from(data, offset)
+            offset += cls.TYPE.size
+            name = data[offset:offset + name_length].decode()
+            offset += name_length
+            count, = cls.COUNT.unpack_from(data, offset)
+            offset += cls.COUNT.size
+
+            layouts = []
+            for _ in range(count):
+                width, height = cls.TEMPLATE.unpack_from(data, offset)
+                offset += cls.TEMPLATE.size
+                grid = [list(data[offset + row * width:offset + (row + 1) * width]) for row in range(height)]
+                offset += width * height
+
+                spawn_count, = cls.TYPE.unpack_from(data, offset)
+                offset += cls.TYPE.size
+                spawns = []
+                for _ in range(spawn_count):
+                    kind, *spawn = cls.SPAWN.unpack_from(data, offset)
+                    offset += cls.SPAWN.size
+                    spawns.append((ENTITY_KINDS[kind], *spawn))
+                layouts.append((grid, spawns))
+            templates[name] = layouts
+
+        return cls(templates, window_height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a chunk template library")
+    parser.add_argument('path', help="output file")
+    parser.add_argument('--samples', type=int, default=500, help="number of layouts sampled per chunk type")
+    parser.add_argument('--seed', type=int, default=0, help="RNG seed")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    library = TemplateLibrary.build(args.samples)
+    library.save(args.path)
+    for name, layouts in library.templates.items():
+        print(f"{name}: {len(layouts)} templates")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,9 @@
 import pygame
 
+import assets
 import constants as c
+from stats import frame_stats
+from tracing import traced
 
 STONE_IMG_PATH = 'resources/terrain/bottom.png'
 GRASS_IMG_PATH = 'resources/terrain/top.png'
@@ -18,12 +21,11 @@ class Terrain(pygame.sprite.Sprite):
         :param position: position of the block
         """
         super().__init__()
-        self.image = pygame.image.load(image_path).convert_alpha()
-        self.image = pygame.transform.scale(self.image, (c.BLOCK_SIZE, c.BLOCK_SIZE))
-        self.rect = self.image.get_rect()
-        self.rect.topleft = position
+        self.image = assets.load_image(image_path, size=(c.BLOCK_SIZE, c.BLOCK_SIZE))
+        self.rect = pygame.Rect(position, (c.BLOCK_SIZE, c.BLOCK_SIZE))
 
 
+@traced('generate_terrain')
 def generate_terrain(grid):
     """
     Generate terrain sprites from a grid
@@ -51,6 +53,7 @@ class Chunk:
     Class representing a chunk of terrain
     """
 
+    @traced('Chunk.__init__')
     def __init__(self, grid, position):
         """
         Initialize the chunk
@@ -62,7 +65,12 @@ class Chunk:
         self.height = len(grid)
         self.position = position
         self.terrain_sprites = generate_terrain(grid)
+        self.columns = [[] for _ in range(self.width)]
+        for sprite in self.terrain_sprites:
+            self.columns[sprite.rect.x // c.BLOCK_SIZE].append(sprite)
         self.entities = pygame.sprite.Group()
+        # Chunk generating function, set by the generator
+        self.chunk_type = None
         self.update_positions()
 
     def update_positions(self):
@@ -80,12 +88,53 @@ class Chunk:
         """
         return self.position[0] + self.width * c.BLOCK_SIZE
 
-    def draw(self, screen):
+    def get_visible_columns(self, screen_width, dx=0):
+        """
+        :param screen_width: width of the visible area
+        :param dx: horizontal camera offset the chunk is drawn with
+        :return: range of the columns that are (at least partially) on the screen
+        """
+        x = self.position[0] + dx
+        first = max(0, -x // c.BLOCK_SIZE)
+        last = min(self.width, (screen_width - x - 1) // c.BLOCK_SIZE + 1)
+        return range(first, max(first, last))
+
+    def draw(self, blits, screen_rect, offset=(0, 0)):
+        """
+        Collect the blits of the terrain sprites in the chunk, skipping columns outside the screen
+        once shifted by the camera offset
+        :param blits: list of (surface, position) pairs to add the blits to
+        :param screen_rect: rect of the screen
+        :param offset: camera offset
+        """
+        dx, dy = offset
+        count = 0
+        for col in self.get_visible_columns(screen_rect.width, dx):
+            column = self.columns[col]
+            blits += [(sprite.image, (sprite.rect.x + dx, sprite.rect.y + dy)) for sprite in column]
+            count += len(column)
+
+        frame_stats.incr('blits', count)
+        frame_stats.incr('blits_skipped', len(self.terrain_sprites) - count)
+
+    def draw_entities(self, blits, screen_rect, offset=(0, 0)):
         """
-        Draws all the terrain sprites in the chunk
-        :param screen: screen instance
+        Collect the blits of the entities in the chunk, skipping the ones outside the screen
+        :param blits: list of (surface, position) pairs to add the blits to
+        :param screen_rect: rect of the screen
+        :param offset: camera offset
         """
-        self.terrain_sprites.draw(screen)
+        dx, dy = offset
+        # Screen area in world coordinates, the entities are culled where they are drawn
+        visible_rect = screen_rect.move(-dx, -dy)
+        count = 0
+        for entity in self.entities:
+            if visible_rect.colliderect(entity.rect):
+                blits.append((entity.image, (entity.rect.x + dx, entity.rect.y + dy)))
+                count += 1
+
+        frame_stats.incr('blits', count)
+        frame_stats.incr('blits_skipped', len(self.entities) - count)
 
     def update(self):
         """
@@ -93,6 +142,34 @@ class Chunk:
         """
         self.terrain_sprites.update()
 
+    def get_state(self):
+        """
+        Capture the simulation state of the chunk - its position and its entities.
+        The grid and the terrain sprites do not change, so they are not copied
+        :return: state tuple for set_state
+        """
+        return self.position[0], [(entity, entity.get_state()) for entity in self.entities]
+
+    def set_state(self, state):
+        """
+        Restore the simulation state of the chunk, moving the terrain back
+        and bringing back the entities that were alive (bullets fired since are dropped)
+        :param state: state returned by get_state
+        """
+        x, entity_states = state
+        dx = self.position[0] - x
+        if dx:
+            self.position[0] = x
+            for sprite in self.terrain_sprites:
+                sprite.rect.x -= dx
+
+        entities = [entity for entity, _ in entity_states]
+        if self.entities.sprites() != entities:
+            self.entities.empty()
+            self.entities.add(*entities)
+        for entity, entity_state in entity_states:
+            entity.set_state(entity_state)
+
     def scroll(self, dx):
         """
         Scroll the chunk
@@ -0,0 +1,168 @@
+import functools
+import json
+import os
+import time
+from collections import deque
+
+
+class Tracer:
+    """
+    Class recording timed spans of the game loop in the Chrome trace event format,
+    which can be opened in chrome://tracing or Perfetto.
+    The spans are collected per frame and written either for a window of frames,
+    or for the recent frames when a frame takes longer than the hitch threshold
+    """
+    # Number of frames written when a hitch is found, including the hitch
+    HISTORY = 60
+    # Maximum number of hitch traces written in a session
+    MAX_HITCHES = 10
+
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.first_frame = 0
+        self.frame_count = None
+        self.hitch_ms = None
+
+        self.origin = time.perf_counter()
+        self.frame = 0
+        self.frame_start = 0
+        self.events = []
+        self.window = []
+        self.history = deque(maxlen=self.HISTORY)
+        self.hitches = 0
+
+    def configure(self, path, first_frame=0, frame_count=None, hitch_ms=None):
+        """
+        Start tracing
+        :param path: path of the trace file, hitch traces get the frame number added to the name
+        :param first_frame: first frame of the traced window
+        :param frame_count: number of frames in the traced window, None to trace until the end of the session
+        :param hitch_ms: trace the frames before each frame longer than this instead of a window of frames
+        """
+        self.enabled = True
+        self.path = path
+        self.first_frame = first_frame
+        self.frame_count = frame_count
+        self.hitch_ms = hitch_ms
+
+    def record(self, name, start, end, args=None):
+        """
+        Record a span
+        :param name: span name
+        :param start: start time (perf_counter)
+        :param end: end time (perf_counter)
+        :param args: optional dictionary shown with the span
+        """
+        event = {
+            'name': name,
+            'ph': 'X',
+            'ts': (start - self.origin) * 1e6,
+            'dur': (end - start) * 1e6,
+            'pid': os.getpid(),
+            'tid': 0,
+        }
+        if args:
+            event['args'] = args
+        self.events.append(event)
+
+    def span(self, name):
+        """
+        :param name: span name
+        :return: context manager recording the span of its block
+        """
+        return Span(self, name)
+
+    def begin_frame(self):
+        """
+        Start a new frame, the spans recorded before it (while loading) are added to it
+        """
+        self.frame += 1
+        self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        """
+        End the frame and write the trace if the window is complete or the frame is a hitch
+        """
+        if not self.enabled:
+            return
+
+        end = time.perf_counter()
+        self.record('frame', self.frame_start, end, {'frame': self.frame})
+        events, self.events = self.events, []
+
+        if self.hitch_ms is not None:
+            self.history.append(events)
+            if (end - self.frame_start) * 1000 > self.hitch_ms and self.hitches < self.MAX_HITCHES:
+                root, ext = os.path.splitext(self.path)
+                self.write(f"{root}-{self.frame}{ext}", [event for frame in self.history for event in frame])
+                self.history.clear()
+                self.hitches += 1
+            return
+
+        if self.frame >= self.first_frame:
+            self.window += events
+            if self.frame_count is not None and self.frame == self.first_frame + self.frame_count - 1:
+                self.close()
+
+    def close(self):
+        """
+        Write the traced window and stop tracing
+        """
+        if self.enabled and self.hitch_ms is None and self.window:
+            self.write(self.path, self.window)
+        self.enabled = False
+        self.window = []
+
+    def write(self, path, events):
+        """
+        Write a trace file
+        :param path: file path
+        :param events: trace events
+        """
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        print(f"Trace of {len(events)} spans written to {path}")
+
+
+class Span:
+    """
+    Context manager recording the span of its block when tracing is enabled
+    """
+    __slots__ = ('tracer', 'name', 'start')
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        if self.tracer.enabled:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.tracer.enabled:
+            self.tracer.record(self.name, self.start, time.perf_counter())
+
+
+tracer = Tracer()
+
+
+def traced(name):
+    """
+    Decorator recording a span for each call of the function when tracing is enabled
+    :param name: span name
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                tracer.record(name, start, time.perf_counter())
+        return wrapper
+    return decorate
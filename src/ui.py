@@ -1,5 +1,7 @@
 import pygame
 
+import assets
+
 BG_PATH = 'resources/ui/bg.png'
 BTN_PATH = 'resources/ui/button.png'
 LOST_PATH = 'resources/ui/lost.png'
@@ -11,16 +13,24 @@ class LostUI:
     """
 
     def __init__(self, dims):
-        bg = pygame.image.load(BG_PATH).convert_alpha()
-        self.bg = pygame.transform.scale(bg, (bg.get_width() * 4, bg.get_height() * 4))
-        self.bg_loc = (dims[0] // 2 - self.bg.get_width() // 2, dims[1] // 2 - self.bg.get_height() // 2)
+        self.bg = assets.load_image(BG_PATH, 4)
+        width, height = assets.get_window_size(self.bg)
+        self.bg_loc = (dims[0] // 2 - width // 2, dims[1] // 2 - height // 2)
+
+        self.text = assets.load_image(LOST_PATH)
+        width, height = assets.get_window_size(self.text)
+        self.text_loc = (dims[0] // 2 - width // 2, dims[1] // 2.5 - height // 2)
 
-        self.text = pygame.image.load(LOST_PATH).convert_alpha()
-        self.text_loc = (dims[0] // 2 - self.text.get_width() // 2, dims[1] // 2.5 - self.text.get_height() // 2)
+        self.btn = assets.load_image(BTN_PATH)
+        width, height = assets.get_window_size(self.btn)
+        self.btn_loc = (dims[0] // 2 - width // 2, dims[1] // 3 * 2 - height // 2)
+        self.btn_rect = pygame.Rect(self.btn_loc, (width, height))
 
-        self.btn = pygame.image.load(BTN_PATH).convert_alpha()
-        self.btn_loc = (dims[0] // 2 - self.btn.get_width() // 2, dims[1] // 3 * 2 - self.btn.get_height() // 2)
-        self.btn_rect = self.btn.get_rect().move(self.btn_loc)
+    def get_surfaces(self):
+        """
+        :return: all the surfaces owned by the UI
+        """
+        return [self.bg, self.text, self.btn]
 
     def on_click(self):
         """
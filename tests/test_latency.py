@@ -0,0 +1,70 @@
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from latency import FramePacer, LatencyMeter  # noqa: E402
+
+FPS = 60
+# Simulation and render time of a frame, in seconds
+WORK_TIME = 0.004
+FRAMES = 60
+
+
+class VsyncDisplay:
+    """
+    Display whose flip blocks until its next refresh, like a flip with vsync
+    """
+
+    def __init__(self, fps):
+        self.period = 1 / fps
+        self.origin = time.perf_counter()
+
+    def flip(self):
+        elapsed = time.perf_counter() - self.origin
+        refresh = self.origin + (int(elapsed / self.period) + 1) * self.period
+        time.sleep(max(0, refresh - time.perf_counter()))
+
+
+def run_frames(pacer):
+    """
+    Run a game loop with a key press read in every frame
+    :param pacer: FramePacer, None to let the blocking flip pace the loop
+    :return: latency report of the key presses
+    """
+    display = VsyncDisplay(FPS)
+    meter = LatencyMeter()
+    for _ in range(FRAMES):
+        if pacer:
+            pacer.wait()
+        frame_start = time.perf_counter()
+        meter.events_read(1)
+        time.sleep(WORK_TIME)
+        work_time = time.perf_counter() - frame_start
+        display.flip()
+        meter.frame_presented()
+        if pacer:
+            pacer.frame_done(work_time)
+    return meter.report()
+
+
+class FramePacerTest(unittest.TestCase):
+
+    def test_paced_latency_is_lower(self):
+        unpaced = run_frames(None)
+        paced = run_frames(FramePacer(FPS))
+        # Read right after a refresh, the input waits a whole period for the next one
+        self.assertGreater(unpaced['lower']['median'], 1000 / FPS * 0.8)
+        # Read just in time, it only waits for the frame work and the margin
+        self.assertLess(paced['lower']['median'], unpaced['lower']['median'] / 2)
+
+    def test_blocked_flip_is_not_estimated(self):
+        pacer = FramePacer(FPS)
+        run_frames(pacer)
+        self.assertLess(pacer.work_time, 1 / FPS / 2)
+
+
+if __name__ == '__main__':
+    unittest.main()